@@ -0,0 +1,134 @@
+# Pathfinding benchmark for mapping.Map on synthetic maps made with mapgen.py
+# Times map loading, path queries and sticker lookups and measures memory use, then writes the results as JSON.
+# Results from two commits can be compared to catch performance regressions.
+#
+# Usage: python benchmark.py [--kinds grid maze warehouse] [--sizes 100 300 1000] [--output results.json] [--compare old.json]
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter as timer
+import mapgen
+from mapping import Map
+
+# Metrics where a larger value is worse, compared by --compare
+METRICS = ("load_s", "find_path_s", "find_fastest_path_s", "find_paths_s", "lookup_us", "memory_mb")
+
+def git_commit():
+    """Returns the current git commit hash, or None when not run inside a git checkout."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd = os.path.dirname(os.path.abspath(__file__)), stderr = subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def best_time(function, repeat):
+    """Calls function repeat times and returns the fastest run in seconds, which is the least disturbed by other processes."""
+    best = float("inf")
+    for _ in range(repeat):
+        begin = timer()
+        function()
+        best = min(best, timer() - begin)
+    return best
+
+def run_case(kind, size, stickers, seed, repeat = 3):
+    """Benchmarks one synthetic map and returns a dictionary of results. Times are per call, the best of repeat runs."""
+    grid, placed = mapgen.generate(kind, size, size, stickers, seed)
+    with tempfile.TemporaryDirectory() as directory:
+        mapfile = os.path.join(directory, f"{kind}_{size}.txt")
+        mapgen.write_map(grid, placed, mapfile)
+        del grid
+        letters = sorted(placed)
+        start = placed[letters[0]]
+
+        # Memory is measured on a separate load, since tracing allocations slows everything down
+        tracemalloc.start()
+        map = Map(mapfile, start)
+        memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del map
+
+        load = best_time(lambda: Map(mapfile, start), repeat)
+        map = Map(mapfile, start)
+
+    targets = letters[1:]
+    count = max(len(targets), 1)
+    find_path = best_time(lambda: [map.find_path(sticker) for sticker in targets], repeat) / count
+    find_fastest_path = best_time(lambda: [map.find_fastest_path(sticker, "up") for sticker in targets], repeat) / count
+    find_paths = best_time(lambda: map.find_paths(targets), repeat)
+
+    def lookups():
+        for i in range(10000):
+            map.get_coords_of_sticker(letters[i % len(letters)])
+            map.is_sticker(start)
+    lookup = best_time(lookups, repeat) / 10000 * 1e6
+
+    return {
+        "kind": kind,
+        "size": size,
+        "stickers": len(placed),
+        "load_s": load,
+        "find_path_s": find_path,
+        "find_fastest_path_s": find_fastest_path,
+        "find_paths_s": find_paths,
+        "lookup_us": lookup,
+        "memory_mb": memory / 1e6,
+    }
+
+def compare(old, new, threshold):
+    """Prints the change of every metric between two result files and returns the amount of regressions larger than threshold (a fraction)."""
+    previous = {(case["kind"], case["size"]): case for case in old["results"]}
+    regressions = 0
+    for case in new["results"]:
+        before = previous.get((case["kind"], case["size"]))
+        if before is None:
+            continue
+        for metric in METRICS:
+            if metric not in before or before[metric] <= 0:
+                continue
+            change = case[metric] / before[metric] - 1
+            flag = ""
+            if change > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{case['kind']:>10} {case['size']:>6} {metric:>20}: {before[metric]:.6g} -> {case[metric]:.6g} ({change:+.0%}){flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark mapping.Map on synthetic maps")
+    parser.add_argument("--kinds", nargs = "+", default = list(mapgen.KINDS), choices = mapgen.KINDS)
+    parser.add_argument("--sizes", nargs = "+", type = int, default = [100, 300, 1000], help = "Side lengths of the square maps")
+    parser.add_argument("--stickers", type = int, default = 10)
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--repeat", type = int, default = 3, help = "Runs per measurement, the fastest one is kept")
+    parser.add_argument("--output", default = "bench_results.json")
+    parser.add_argument("--compare", help = "Earlier result file to compare against")
+    parser.add_argument("--threshold", type = float, default = 0.2, help = "Relative slowdown counted as a regression")
+    args = parser.parse_args()
+
+    results = []
+    for kind in args.kinds:
+        for size in args.sizes:
+            case = run_case(kind, size, args.stickers, args.seed, args.repeat)
+            print(f"{kind:>10} {size:>6}: load {case['load_s'] * 1000:.1f} ms, find_path {case['find_path_s'] * 1000:.2f} ms, "
+                  f"find_fastest_path {case['find_fastest_path_s'] * 1000:.2f} ms, find_paths {case['find_paths_s'] * 1000:.2f} ms, "
+                  f"lookup {case['lookup_us']:.2f} us, memory {case['memory_mb']:.1f} MB")
+            results.append(case)
+
+    output = {"commit": git_commit(), "python": platform.python_version(), "results": results}
+    with open(args.output, "w") as file:
+        json.dump(output, file, indent = 4)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            old = json.load(file)
+        if compare(old, output, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Command queue between the speech engine and the movement thread
+# Commands are lists [command, argument] or [command, argument, time issued (perf_counter)], like the ones speech.py puts in.
+# Urgent commands jump the queue and preempt the job being driven, and repeated or outdated commands are merged.
+
+import heapq
+import itertools
+import threading
+from queue import Empty
+from time import perf_counter as timer
+
+URGENT = 0
+NORMAL = 1
+
+# Priority of every command, commands missing here are NORMAL
+PRIORITIES = {"stop": URGENT, "comeBack": URGENT}
+
+# Commands that make waiting commands pointless: when one of these is put in the queue, waiting commands of the listed kinds are dropped
+# Only urgent commands cancel trips, a new destination is queued behind the ones already waiting
+SUPERSEDES = {
+    "stop": ("tableName", "tour", "comeBack"),
+    "comeBack": ("tableName", "tour", "comeBack"),
+}
+
+class CommandQueue():
+    """
+    Priority queue of commands, usable in place of queue.Queue by the speech engine (put) and Movement (get, task_done).
+    Commands with the same priority come out in the order they were put in. A command equal to one still waiting is dropped,
+    and a command listed in supersedes drops the waiting commands it makes pointless. Every dropped command is printed.
+    Putting an urgent command sets a preemption flag, which the movement thread checks at every control tick to abort its current job.
+
+    :param priorities: Dictionary of command -> priority (URGENT or NORMAL)
+    :param supersedes: Dictionary of command -> commands it replaces
+    """
+    def __init__(self, priorities = PRIORITIES, supersedes = SUPERSEDES):
+
+        self.priorities = priorities
+        self.supersedes = supersedes
+        self.pending = [] # Heap of (priority, sequence number, command)
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.preemption = threading.Event()
+        self.preempt_time = None # When the urgent command that set the preemption flag was issued
+        self.coalesced = 0 # Amount of commands dropped as duplicates or superseded
+
+    def put(self, command):
+        """Adds a command, merging it with the commands already waiting."""
+        name, argument = command[0], command[1]
+        with self.condition:
+            if any(waiting[0] == name and waiting[1] == argument for _, _, waiting in self.pending):
+                print(f"Dropped command {[name, argument]}, it is already waiting")
+                self.coalesced += 1
+                return
+
+            replaced = self.supersedes.get(name, ())
+            if replaced:
+                kept = []
+                for entry in self.pending:
+                    if entry[2][0] in replaced:
+                        print(f"Dropped command {entry[2][:2]}, superseded by {[name, argument]}")
+                        self.coalesced += 1
+                    else:
+                        kept.append(entry)
+                self.pending = kept
+                heapq.heapify(self.pending)
+
+            priority = self.priorities.get(name, NORMAL)
+            heapq.heappush(self.pending, (priority, next(self.sequence), command))
+            if priority == URGENT:
+                self.preempt_time = command[2] if len(command) > 2 else timer()
+                self.preemption.set()
+            self.condition.notify()
+
+    def get(self, timeout = None):
+        """Removes and returns the most urgent command, waiting for one at most timeout seconds. Raises queue.Empty if none came."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.pending, timeout):
+                raise Empty
+            priority, _, command = heapq.heappop(self.pending)
+
+            # The urgent command is being handled now, so the job it interrupted is over
+            if priority == URGENT and not any(entry[0] == URGENT for entry in self.pending):
+                self.preemption.clear()
+            return command
+
+    def task_done(self):
+        """Kept for compatibility with queue.Queue, commands need no acknowledgement."""
+
+    def empty(self):
+        """Returns True if no command is waiting."""
+        with self.condition:
+            return not self.pending
+
+    def preempted(self):
+        """Returns True if an urgent command is waiting, meaning the job being driven should be aborted."""
+        return self.preemption.is_set()
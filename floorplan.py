@@ -0,0 +1,144 @@
+# Floorplan importer: turns a bitmap of the floor into a map for mapping.Map
+# Dark pixels are the line the robot follows, strongly coloured pixels (e.g. red dots) mark RFID stickers.
+# The image is downsampled to the tile grid with NumPy block reductions, so images of tens of megapixels take seconds.
+#
+# Usage: python floorplan.py <image (.pgm, .ppm or .png)> <output map file> [--tile N] [--compile | --tiled]
+# PNG images need Pillow to be installed, PGM and PPM images are read directly.
+
+import argparse
+import numpy as np
+import mapgen
+import tiledmap
+from mapping import Map
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+def read_netpbm(path):
+    """Reads a binary PGM (P5) or PPM (P6) image with 8-bit samples. Returns a uint8 array of shape (height, width) or (height, width, 3)."""
+    with open(path, "rb") as file:
+        data = file.read()
+
+    # Header: magic, width, height, maximum value, separated by whitespace, "#" starting comments
+    fields = []
+    offset = 0
+    while len(fields) < 4:
+        while data[offset:offset + 1].isspace():
+            offset += 1
+        if data[offset:offset + 1] == b"#":
+            offset = data.index(b"\n", offset) + 1
+            continue
+        end = offset
+        while not data[end:end + 1].isspace():
+            end += 1
+        fields.append(data[offset:end])
+        offset = end
+    offset += 1 # Single whitespace character before the pixel data
+
+    magic, width, height, maximum = fields[0], int(fields[1]), int(fields[2]), int(fields[3])
+    if magic not in (b"P5", b"P6") or maximum > 255:
+        raise Exception(f"{path} is not an 8-bit binary PGM or PPM image")
+    channels = 3 if magic == b"P6" else 1
+    pixels = np.frombuffer(data, dtype = np.uint8, count = width * height * channels, offset = offset)
+    return pixels.reshape((height, width, 3) if channels == 3 else (height, width))
+
+def read_image(path):
+    """Reads an image file into a uint8 array of shape (height, width) or (height, width, 3)."""
+    if path.lower().endswith((".pgm", ".ppm", ".pnm")):
+        return read_netpbm(path)
+    if Image is None:
+        raise Exception("Reading this image format requires Pillow, convert the image to PGM/PPM or install Pillow")
+    image = Image.open(path)
+    return np.asarray(image.convert("RGB" if image.mode not in ("L", "1") else "L"))
+
+def rasterize(image, tile, line_fraction = 0.25, marker_fraction = 0.25, dark = 100, saturation = 80):
+    """
+    Downsamples an image to a tile grid where every tile covers tile x tile pixels.
+    A tile is a line tile if at least line_fraction of its pixels are dark (brightness below dark),
+    and a marker tile if at least marker_fraction of them are coloured (channels differing by more than saturation).
+    Returns a tuple (uint8 grid with 1 for line and marker tiles, boolean array of marker tiles).
+    """
+    height = image.shape[0] // tile
+    width = image.shape[1] // tile
+    image = image[:height * tile, :width * tile]
+
+    if image.ndim == 3:
+        colour = (image.max(axis = 2) - image.min(axis = 2)) > saturation
+        line = (image.sum(axis = 2, dtype = np.uint16) < 3 * dark) & ~colour
+    else:
+        colour = np.zeros(image.shape, dtype = bool)
+        line = image < dark
+
+    # Block reduction: count matching pixels in every tile x tile block
+    def block_count(pixels):
+        return pixels.reshape(height, tile, width, tile).sum(axis = (1, 3), dtype = np.int32)
+
+    needed_line = line_fraction * tile * tile
+    needed_marker = marker_fraction * tile * tile
+    markers = block_count(colour) >= needed_marker
+    grid = ((block_count(line) >= needed_line) | markers).astype(np.uint8)
+    return grid, markers
+
+def find_stickers(markers):
+    """
+    Groups touching marker tiles into markers and puts one sticker on the tile closest to the middle of each.
+    Stickers are named "a", "b", ... in reading order. Returns a dictionary of sticker letter -> (y, x).
+    """
+    remaining = {(int(y), int(x)) for y, x in zip(*np.nonzero(markers))}
+    centers = []
+    while remaining:
+        # Flood fill one marker
+        stack = [remaining.pop()]
+        group = []
+        while stack:
+            y, x = stack.pop()
+            group.append((y, x))
+            for neighbor in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+                if neighbor in remaining:
+                    remaining.discard(neighbor)
+                    stack.append(neighbor)
+        mean_y = sum(y for y, _ in group) / len(group)
+        mean_x = sum(x for _, x in group) / len(group)
+        centers.append(min(group, key = lambda tile: (tile[0] - mean_y) ** 2 + (tile[1] - mean_x) ** 2))
+
+    centers.sort()
+    if len(centers) > len(mapgen.STICKER_LETTERS):
+        raise Exception(f"Found {len(centers)} sticker markers, but at most {len(mapgen.STICKER_LETTERS)} stickers are supported")
+    return dict(zip(mapgen.STICKER_LETTERS, centers))
+
+def import_floorplan(image_path, mapfile, tile = 8, output = "text", **options):
+    """
+    Converts a floorplan image to a map file. Output is "text" for a text map, "compiled" for a text map plus its compiled
+    version (see Map.compile) or "tiled" for a text map plus a tiled map file next to it (see tiledmap.write_tiled).
+    Other keyword arguments are passed on to rasterize(). Returns a tuple (grid, stickers).
+    """
+    grid, markers = rasterize(read_image(image_path), tile, **options)
+    stickers = find_stickers(markers)
+    mapgen.write_map(grid, stickers, mapfile)
+    if output == "compiled":
+        Map(mapfile, None, compiled = False).compile()
+    elif output == "tiled":
+        tiledmap.write_tiled(mapfile, mapfile.rsplit(".", 1)[0] + ".tiles")
+    return grid, stickers
+
+def main():
+    parser = argparse.ArgumentParser(description = "Convert a floorplan image to a line-following map")
+    parser.add_argument("image")
+    parser.add_argument("output")
+    parser.add_argument("--tile", type = int, default = 8, help = "Pixels per map tile along each side")
+    parser.add_argument("--line-fraction", type = float, default = 0.25, help = "Share of dark pixels that makes a tile part of the line")
+    parser.add_argument("--marker-fraction", type = float, default = 0.25, help = "Share of coloured pixels that makes a tile a sticker marker")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--compile", action = "store_true", help = "Also write the compiled binary map")
+    group.add_argument("--tiled", action = "store_true", help = "Also write a tiled map file")
+    args = parser.parse_args()
+
+    output = "compiled" if args.compile else "tiled" if args.tiled else "text"
+    grid, stickers = import_floorplan(args.image, args.output, args.tile, output,
+                                      line_fraction = args.line_fraction, marker_fraction = args.marker_fraction)
+    print(f"Wrote {grid.shape[0]}x{grid.shape[1]} map with {len(stickers)} stickers to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,9 @@
 #  White things (e.g. white poster board) reflect IR light.
 #  Hence while black, in = LOW
 import time
-from threading import Thread
 from time import sleep
 import RPi.GPIO as GPIO
+from sensorworker import SensorWorker
 
 class IRSensor():
 
@@ -22,15 +22,23 @@ class IRSensor():
         elif data == 0:
             return False
 
-class IRController(Thread):
+class IRController(SensorWorker):
+    """
+    Thread reading both line sensors and putting the correction needed in a queue: "l" (left), "r" (right) or "b" (back).
 
-    def __init__(self, pi, queue, inpin1, inpin2):
+    :param pi: Instance of Raspberri Pi GPIO object used to read pins
+    :param queue: Queue to put corrections in
+    :param inpin1: Pin of the first IR sensor
+    :param inpin2: Pin of the second IR sensor
+    :param paused: Whether the thread starts paused (see SensorWorker)
+    :param interval: Seconds between readings
+    """
+    def __init__(self, pi, queue, inpin1, inpin2, paused = False, interval = 0.2):
 
-        super(IRController, self).__init__()
+        super(IRController, self).__init__(queue, paused)
         
         self.pi = pi
-        self.queue = queue
-        self.running = True
+        self.interval = interval
         self.sensor1 = IRSensor(pi, inpin1)
         self.sensor2 = IRSensor(pi, inpin2)
 
@@ -38,6 +46,9 @@ class IRController(Thread):
         """Called on thread startup"""
         while self.running:
 
+            if not self.wait_active():
+                continue
+
             data1 = self.sensor1.scan_line()
             data2 = self.sensor2.scan_line()
 
@@ -49,22 +60,18 @@ class IRController(Thread):
                     
             elif data1 == True and data2 == False:
                 #Turn left
-                self.queue.put("l")
+                self.report("l")
                 print("left")
 
             elif data1 == False and data2 == True:
-                self.queue.put("r")
+                self.report("r")
                 print("right")
                 
             elif data1 == False and data2 == False:
-                self.queue.put("b")
+                self.report("b")
                 print("back")
             
-            sleep(0.2)
-
-    def stop(self):
-            """Stops sensing and autocorrection"""
-            self.running = False
+            sleep(self.interval)
 
 #TESTING CODE
 #GPIO.setmode(GPIO.BOARD)
@@ -0,0 +1,163 @@
+import heapq
+import numpy as np
+from mapping import MOVES, MASK_MOVES, HEADINGS, OPPOSITE
+
+# Number of set bits in every possible neighbor mask, i.e. the number of open neighbors of a tile
+DEGREE = np.array([len(moves) for moves in MASK_MOVES], dtype = np.uint8)
+
+class JunctionGraph():
+    """
+    Compressed version of a Map that the robot can plan over, holding only the tiles it makes decisions at.
+    Nodes are RFID stickers, branch points and dead ends. Every corridor between two nodes is collapsed into one weighted edge.
+    Edges are stored per node as tuples (target node, corridor length in tiles, turns inside the corridor, first move, last move,
+    sum of the cost classes of the tiles driven onto), moves being indexes into MOVES. The tiles of a corridor are only walked again when a plan is expanded with expand().
+
+    :param map: Map object to compress. The graph rebuilds itself on the next plan if tiles of the map get blocked or unblocked.
+    """
+    def __init__(self, map):
+
+        self.build(map)
+
+    def build(self, map):
+        """(Re)builds the graph from the current state of a map, including its blocked tiles."""
+        self.map = map
+        self.version = map.version
+        masks = map.flatmasks
+        self.offsets = map.offsets
+
+        # Every traversible tile that doesn't have exactly two neighbors is a node, and so is every sticker
+        degree = DEGREE[map.masks]
+        junctions = (map.grid != 0) & (degree != 2)
+        for y, x in map.sticker_at:
+            junctions[y, x] = True
+        self.nodes = np.flatnonzero(junctions).tolist() # Node id -> flat tile index
+        self.node_of = {index: node for node, index in enumerate(self.nodes)} # Flat tile index -> node id
+
+        # Walk every corridor leaving every node
+        self.edges = []
+        for index in self.nodes:
+            self.edges.append([self._walk(index, move) for move in MASK_MOVES[masks[index]]])
+
+    def _walk(self, index, move):
+        """
+        Follows the corridor leaving tile index in direction move until it reaches a node.
+        Returns the edge tuple (target node, length, turns, first move, last move, cost), target being None for corridors looping without a node.
+        """
+        masks = self.map.flatmasks
+        costs = self.map.flatgrid
+        first = move
+        length = 0
+        cost = 0
+        turns = 0
+        start = index
+        while True:
+            index += self.offsets[move]
+            length += 1
+            cost += costs[index]
+            if index in self.node_of:
+                return (self.node_of[index], length, turns, first, move, cost)
+            if index == start:
+                return (None, length, turns, first, move, cost)
+
+            # Corridor tiles have exactly two neighbors, continue through the one we didn't come from
+            for exit in MASK_MOVES[masks[index]]:
+                if exit != OPPOSITE[move]:
+                    break
+            if exit != move:
+                turns += 1
+            move = exit
+
+    def edge_cost(self, edge, heading):
+        """Returns the time in seconds it takes to drive along an edge when arriving at its start facing heading (index into MOVES)."""
+        map = self.map
+        _, _, turns, first, _, tiles = edge
+        cost = tiles * map.forward_cost + turns * map.turn_cost
+        if heading != first:
+            cost += map.uturn_cost if OPPOSITE[heading] == first else map.turn_cost
+        return cost
+
+    def plan(self, start, heading, goal):
+        """
+        Finds the fastest sequence of edges between two tiles with the formula (y, x) over the graph.
+        The start tile may be inside a corridor, the goal tile has to be a node. Heading is "up", "down", "left" or "right".
+        Returns a tuple (list of edges, predicted trip time in seconds), or None if the goal can't be reached.
+        """
+        if self.version != self.map.version:
+            self.build(self.map)
+
+        width = self.map.width
+        start = start[0] * width + start[1]
+        goal = goal[0] * width + goal[1]
+        if goal not in self.node_of:
+            raise Exception(f"{divmod(goal, width)} is not a junction")
+        if start == goal:
+            return [], 0.0
+
+        # Edges available at the start, which is a temporary node (id -1) if the robot stands inside a corridor
+        if start in self.node_of:
+            source = self.node_of[start]
+            first_edges = self.edges[source]
+        else:
+            source = -1
+            first_edges = [self._walk(start, move) for move in MASK_MOVES[self.map.flatmasks[start]]]
+        target = self.node_of[goal]
+
+        # Dijkstra over (node, heading) states, heading being the direction the robot faces when arriving at the node
+        state = (source, HEADINGS[heading])
+        best = {state: 0.0}
+        parent = {state: (None, None)}
+        heap = [(0.0, state)]
+        while heap:
+            time, state = heapq.heappop(heap)
+            if time > best[state]:
+                continue
+            node, facing = state
+            if node == target:
+                edges = []
+                while parent[state][0] is not None:
+                    state, edge = parent[state]
+                    edges.append(edge)
+                edges.reverse()
+                return edges, time
+
+            for edge in (first_edges if node == -1 else self.edges[node]):
+                if edge[0] is None:
+                    continue
+                child = (edge[0], edge[4])
+                cost = time + self.edge_cost(edge, facing)
+                if cost < best.get(child, float("inf")):
+                    best[child] = cost
+                    parent[child] = (state, edge)
+                    heapq.heappush(heap, (cost, child))
+
+        return None
+
+    def expand(self, start, edges):
+        """Expands a list of edges starting at tile start (y, x) back into a tile path in the [coordinates, direction] format of Map.find_path."""
+        masks = self.map.flatmasks
+        width = self.map.width
+        index = start[0] * width + start[1]
+        path = []
+        for target, length, _, move, _, _ in edges:
+            for _ in range(length):
+                index += self.offsets[move]
+                path.append([divmod(index, width), MOVES[move][2]])
+                for exit in MASK_MOVES[masks[index]]:
+                    if exit != OPPOSITE[move]:
+                        break
+                move = exit
+        return path
+
+    def find_path(self, sticker, heading):
+        """
+        Same as Map.find_fastest_path, but planned over the junction graph from the current coordinates of the map.
+        Returns a tuple (path, predicted trip time in seconds), or None if the sticker can't be reached.
+        """
+        end = self.map.get_coords_of_sticker(sticker)
+        if end is None:
+            raise Exception(f"'{sticker}' is not a valid sticker")
+        result = self.plan(self.map.current, heading, end)
+        if result is None:
+            return None
+        edges, time = result
+        return self.expand(self.map.current, edges), time
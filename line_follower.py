@@ -0,0 +1,152 @@
+# PID line following: steers the robot by changing the duty cycles of the wheels on every tick, without stopping
+# The two IR sensors give the error: 0 while both see the line, 1 or -1 once the robot drifted off to one side.
+# Replaces the bang-bang corrections (stop, drive one wheel for a fixed time, start again) while driving between stickers,
+# and turns onto branches at junctions while still moving instead of stopping for a fixed-time turn.
+
+from time import sleep
+from time import perf_counter as timer
+
+class PID():
+    """
+    PID controller turning an error into an output clamped to [-limit, limit].
+    The integral is clamped as well, so it can't wind up while the output is saturated.
+
+    :param kp: Proportional gain
+    :param ki: Integral gain
+    :param kd: Derivative gain
+    :param limit: Largest absolute output
+    """
+    def __init__(self, kp, ki, kd, limit = 1.0):
+
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.limit = limit
+        self.reset()
+
+    def reset(self):
+        """Forgets the integral and the previous error."""
+        self.integral = 0.0
+        self.previous = None
+
+    def update(self, error, dt):
+        """Returns the output for an error measured dt seconds after the previous one."""
+        derivative = 0.0
+        if dt > 0:
+            self.integral += error * dt
+            if self.ki:
+                bound = self.limit / abs(self.ki)
+                self.integral = max(-bound, min(bound, self.integral))
+            if self.previous is not None:
+                derivative = (error - self.previous) / dt
+        self.previous = error
+
+        output = self.kp * error + self.ki * self.integral + self.kd * derivative
+        return max(-self.limit, min(self.limit, output))
+
+class LineFollower():
+    """
+    Keeps the robot on the line with a PID controller acting on the duty cycles of both wheels.
+    The wheel on the side the robot has to steer to keeps its duty cycle, the other one is slowed down by the output of the controller,
+    down to standing still at full output, which is what the bang-bang corrections did.
+    The duty cycles the motors had when the follower was created are taken as the calibrated straight-line speeds.
+
+    :param motors: MotorController whose Left and Right motors are steered
+    :param sensor1: First IRSensor, the one that needed an "l" correction when it alone saw the line
+    :param sensor2: Second IRSensor
+    :param kp: Proportional gain
+    :param ki: Integral gain, corrects a steady drift to one side
+    :param kd: Derivative gain, damps swinging around the line
+    :param speed: Factor applied to the calibrated duty cycles while following the line
+    :param interval: Seconds between control ticks
+    """
+    def __init__(self, motors, sensor1, sensor2, kp = 0.6, ki = 0.4, kd = 0.05, speed = 1.0, interval = 0.02):
+
+        self.motors = motors
+        self.sensor1 = sensor1
+        self.sensor2 = sensor2
+        self.pid = PID(kp, ki, kd)
+        self.speed = speed
+        self.interval = interval
+        self.base = (motors.Left.speed, motors.Right.speed)
+        self.steering = 0.0 # Last output of the controller
+        self.last = None # Time of the last tick
+
+    def error(self):
+        """Returns the error read from the sensors: 0 on the line, 1 or -1 when drifted to one side, None if the line is lost."""
+        on1 = self.sensor1.scan_line()
+        on2 = self.sensor2.scan_line()
+        if on1 and on2:
+            return 0
+        elif on1:
+            return 1
+        elif on2:
+            return -1
+        return None
+
+    def start(self):
+        """Resets the controller and sets the straight-line duty cycles. Call before driving forward along a line."""
+        self.pid.reset()
+        self.steering = 0.0
+        self.last = timer()
+        self.set_steering(0.0)
+
+    def step(self):
+        """Reads the sensors and steers. Returns False if the line was lost, in which case the duty cycles are left as they were."""
+        error = self.error()
+        now = timer()
+        dt = now - self.last if self.last is not None else 0.0
+        self.last = now
+        if error is None:
+            return False
+        self.steering = self.pid.update(error, dt)
+        self.set_steering(self.steering)
+        return True
+
+    def set_steering(self, steering):
+        """Sets the duty cycles for a steering between -1 and 1, positive slowing down the right wheel."""
+        left, right = self.base
+        left *= self.speed * (1 - max(-steering, 0.0))
+        right *= self.speed * (1 - max(steering, 0.0))
+        self.motors.Left.set_speed(min(100.0, left))
+        self.motors.Right.set_speed(min(100.0, right))
+
+    def stop(self):
+        """Restores the calibrated duty cycles, which the fixed-time turns and corrections rely on."""
+        self.motors.Left.set_speed(self.base[0])
+        self.motors.Right.set_speed(self.base[1])
+
+    def turn(self, turn, inner = 0.2, timeout = 3.0, abort = None):
+        """
+        Turns onto a branch at a junction without stopping: both wheels keep driving forward, the inner one slowed down to inner of its duty cycle.
+        The turn ends as soon as the sensors left the old line and one of them sees the new branch, after which the robot drives straight again.
+        If the branch isn't found within timeout seconds (the time a fixed 90 degree turn takes), the turn ends anyway and the follower has to find the line.
+        Motors must already be driving forward. Turn is "cw" or "ccw", returns True if the new branch was found.
+        Abort is an optional function checked every poll, the turn is given up as soon as it returns True.
+        """
+        left, right = self.base
+        if turn == "cw":
+            left *= inner
+        elif turn == "ccw":
+            right *= inner
+        else:
+            raise Exception(f"'{turn}' can't be driven as a rolling turn")
+        self.motors.Left.set_speed(min(100.0, left * self.speed))
+        self.motors.Right.set_speed(min(100.0, right * self.speed))
+
+        # Wait until both sensors are off the old line, then until one of them sees the new branch
+        deadline = timer() + timeout
+        off_line = False
+        found = False
+        while timer() < deadline and not (abort is not None and abort()):
+            on1 = self.sensor1.scan_line()
+            on2 = self.sensor2.scan_line()
+            if not on1 and not on2:
+                off_line = True
+            elif off_line:
+                found = True
+                break
+            sleep(self.interval / 4)
+
+        self.start()
+        return found
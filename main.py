@@ -12,7 +12,7 @@ import os                                   # Get path function
 from halo import Halo                       # Animated spinners for loading
 from time import perf_counter as timer      # Timer to time model load speed
 from threading import Thread                # Multithreading
-from queue import Queue                     # Queue module, used to pass information between threads in a shared queue
+from commands import CommandQueue           # Priority queue passing commands between threads, urgent commands preempt the current job
 import movement
 import mapping
 
@@ -23,13 +23,13 @@ def main():
     GPIO.setwarnings(False)
     
     # Initialize queue to put speech commands in
-    speechqueue = Queue()
+    speechqueue = CommandQueue()
 
     # Initialize Thread 1 as speech recognition running in background. 
     thread1 = speech.Recognizer(speechqueue)
     
     # Initialize Thread 2 as movement class, checking queue for commands.
-    thread2 = movement.Movement(speechqueue, pi, "map1.txt", "l", (2,5))
+    thread2 = movement.Movement(speechqueue, pi, "map1.txt", "left", (2,5))
 
     # Start both threads
     thread1.start()
@@ -51,6 +51,7 @@ def main():
             # Stop thread2
             thread2.stop()
             thread2.join()
+            thread2.metrics.report() # Command latencies of this run
 
             # Release GPIO resources
             GPIO.cleanup()
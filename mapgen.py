@@ -0,0 +1,120 @@
+# Synthetic map generator for testing and benchmarking the pathfinding code in mapping.py
+# Maps are written in the same text format as map1.txt: "#" for line tiles, letters for RFID stickers and "-" for empty tiles.
+# Grids may also hold cost classes 2 to 9 for slow tiles, which are written as digits.
+#
+# Usage: python mapgen.py <kind> <height> <width> <output file> [--stickers N] [--seed S]
+
+import argparse
+import numpy as np
+
+KINDS = ("grid", "maze", "warehouse")
+STICKER_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+def grid_map(height, width, spacing = 4):
+    """Returns a uint8 grid (1 = line, 0 = empty) of horizontal and vertical lines every spacing tiles."""
+    grid = np.zeros((height, width), dtype = np.uint8)
+    grid[::spacing, :] = 1
+    grid[:, ::spacing] = 1
+    return grid
+
+def maze_map(height, width, rng):
+    """
+    Returns a uint8 grid holding a perfect maze (exactly one path between any two tiles) with cells on even coordinates.
+    Uses the binary tree algorithm, where every cell opens a passage either up or left, so the whole maze is carved in a few vectorized steps.
+    """
+    grid = np.zeros((height, width), dtype = np.uint8)
+    cells = grid[::2, ::2]
+    cells[:] = 1
+    cells_y, cells_x = cells.shape
+
+    # For every cell pick up or left, cells on the top row can only go left and cells in the left column only up
+    up = rng.random((cells_y, cells_x)) < 0.5
+    up[0, :] = False
+    up[:, 0] = True
+    up[0, 0] = False
+    left = ~up
+    left[:, 0] = False
+
+    ys, xs = np.nonzero(up)
+    grid[2 * ys - 1, 2 * xs] = 1
+    ys, xs = np.nonzero(left)
+    grid[2 * ys, 2 * xs - 1] = 1
+    return grid
+
+def warehouse_map(height, width, aisle = 2, rack = 6):
+    """
+    Returns a uint8 grid shaped like a warehouse: a main corridor around the edge and across the middle,
+    with vertical aisles every aisle + rack tiles connecting them.
+    """
+    grid = np.zeros((height, width), dtype = np.uint8)
+    grid[0, :] = 1
+    grid[-1, :] = 1
+    grid[height // 2, :] = 1
+    grid[:, 0] = 1
+    grid[:, -1] = 1
+    grid[:, ::aisle + rack] = 1
+    return grid
+
+def place_stickers(grid, count, rng):
+    """
+    Picks count random line tiles to put stickers on, preferring junctions (tiles with more than two neighbors) like on the real floor.
+    Returns a dictionary of sticker letter -> (y, x). At most 26 stickers can be placed.
+    """
+    count = min(count, len(STICKER_LETTERS))
+    open_tiles = grid != 0
+    neighbors = np.zeros(grid.shape, dtype = np.uint8)
+    neighbors[1:, :] += open_tiles[:-1, :]
+    neighbors[:-1, :] += open_tiles[1:, :]
+    neighbors[:, 1:] += open_tiles[:, :-1]
+    neighbors[:, :-1] += open_tiles[:, 1:]
+
+    candidates = np.flatnonzero(open_tiles & (neighbors > 2))
+    if len(candidates) < count:
+        candidates = np.flatnonzero(open_tiles)
+    picks = rng.choice(candidates, size = min(count, len(candidates)), replace = False)
+    width = grid.shape[1]
+    return {letter: divmod(int(index), width) for letter, index in zip(STICKER_LETTERS, picks)}
+
+def generate(kind, height, width, stickers = 10, seed = 0):
+    """Generates a map of the given kind. Returns a tuple (uint8 grid, dictionary of sticker letter -> (y, x))."""
+    rng = np.random.default_rng(seed)
+    if kind == "grid":
+        grid = grid_map(height, width)
+    elif kind == "maze":
+        grid = maze_map(height, width, rng)
+    elif kind == "warehouse":
+        grid = warehouse_map(height, width)
+    else:
+        raise Exception(f"'{kind}' is not a map kind, pick one of {KINDS}")
+    return grid, place_stickers(grid, stickers, rng)
+
+def write_map(grid, stickers, mapfile):
+    """Writes a grid and its stickers to a text map file, one row at a time so large maps don't need a second copy in memory."""
+    table = np.array([ord("-"), ord("#")] + [ord(str(cost)) for cost in range(2, 10)], dtype = np.uint8)
+    by_row = {}
+    for letter, (y, x) in stickers.items():
+        by_row.setdefault(y, []).append((x, letter))
+    with open(mapfile, "w") as file:
+        for y in range(grid.shape[0]):
+            row = table[grid[y]]
+            for x, letter in by_row.get(y, ()):
+                row[x] = ord(letter)
+            file.write(row.tobytes().decode())
+            file.write("\n")
+
+def main():
+    parser = argparse.ArgumentParser(description = "Generate a synthetic line-following map")
+    parser.add_argument("kind", choices = KINDS)
+    parser.add_argument("height", type = int)
+    parser.add_argument("width", type = int)
+    parser.add_argument("output")
+    parser.add_argument("--stickers", type = int, default = 10, help = "Number of RFID stickers to place (at most 26)")
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args()
+
+    grid, stickers = generate(args.kind, args.height, args.width, args.stickers, args.seed)
+    write_map(grid, stickers, args.output)
+    print(f"Wrote {args.height}x{args.width} {args.kind} map with {len(stickers)} stickers to {args.output}")
+
+if __name__ == "__main__":
+    main()
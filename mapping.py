@@ -1,152 +1,524 @@
-class Node():
-    """Node class used to represent tiles of the map for pathfinding."""
-    def __init__(self, state, parent, action):
-        self.state = state
-        self.parent = parent
-        self.action = action
-
-class NodeQueue():
-    """FCFS (first come first serve) queue-like object with the ability to remove nodes automatically when reading them from queue."""
-    def __init__ (self):
-        self.frontier = []
-    
-    def add(self, node):
-        """Adds given node to the end of the queue"""
-        self.frontier.append(node)
-    
-    def contains_state(self, state):
-        """Returns true if queue already contains a given state, False otherwise"""
-        return any(node.state == state for node in self.frontier)
-
-    def empty(self):
-        """Returns True if queue is empty, False otherwise"""
-        if len(self.frontier) == 0:
-            return True
-        else:
-            return False
+from collections import deque, OrderedDict
+from array import array
+import hashlib
+import heapq
+import json
+import os
+import struct
+import sys
+import threading
+import weakref
+import zlib
+import numpy as np
+from waypoints import WaypointRegistry, waypoints_path
+
+# Moves available on the map, indexed the same way by the search code: (row offset, column offset, action name)
+MOVES = ((-1, 0, "up"), (1, 0, "down"), (0, -1, "left"), (0, 1, "right"))
+MOVE_LETTERS = "udlr" # One letter per entry in MOVES, used to store paths compactly
+HEADINGS = {move[2]: i for i, move in enumerate(MOVES)}
+OPPOSITE = (1, 0, 3, 2) # Index of the reverse heading for each entry in MOVES
+
+# Compiled map file format (see Map.compile): a header, followed by the grid, the neighbor masks (both height * width bytes),
+# the letter stickers as (name length, name, y, x) records and the "@" tiles as (y, x) records. All numbers are little-endian.
+# Waypoint names aren't stored, they come from the waypoint registry on every load, so editing it doesn't make the compiled file stale.
+# Header: magic, version, height, width, sticker count, "@" tile count, source file size, source file mtime (ns), source file SHA-1,
+# CRC-32 of everything after the header
+COMPILED_MAGIC = b"RMAP"
+COMPILED_VERSION = 2
+COMPILED_HEADER = struct.Struct("<4sHIIIIQQ20sI")
+COMPILED_STICKER = struct.Struct("<II")
+
+def compiled_path(mapfile):
+    """Returns the path of the compiled version of a text map file, e.g. map1.rmap for map1.txt."""
+    return os.path.splitext(mapfile)[0] + ".rmap"
+
+def neighbor_masks(grid):
+    """
+    Computes a 4-bit neighbor mask for every tile of a uint8 grid in one vectorized pass.
+    Bit i is set when the neighbor in direction MOVES[i] exists and is traversable, so empty tiles still get masks of their neighbors.
+    """
+    open_tiles = grid != 0
+    masks = np.zeros(grid.shape, dtype = np.uint8)
+    masks[1:, :] |= open_tiles[:-1, :] * np.uint8(1) # Up
+    masks[:-1, :] |= open_tiles[1:, :] * np.uint8(2) # Down
+    masks[:, 1:] |= open_tiles[:, :-1] * np.uint8(4) # Left
+    masks[:, :-1] |= open_tiles[:, 1:] * np.uint8(8) # Right
+    return masks
+
+def tile_costs(chars):
+    """
+    Converts a uint8 array of map file characters to the grid stored by Map: the cost class of every traversible tile, 0 for empty tiles.
+    "#", "@" and stickers have cost class 1, digits "1" to "9" are traversible tiles with that cost class. Returns a tuple (grid, sticker tiles).
+    """
+    letters = ((chars >= ord("a")) & (chars <= ord("z"))) | ((chars >= ord("A")) & (chars <= ord("Z")))
+    digits = (chars >= ord("1")) & (chars <= ord("9"))
+    grid = np.where(digits, chars - ord("0"), (chars == ord("#")) | (chars == ord("@")) | letters).astype(np.uint8)
+    return grid, letters
+
+# Value of distance fields (see Map.distance_field) on tiles that can't reach the destination
+UNREACHABLE = np.iinfo(np.int32).max
+
+# Moves (indexes into MOVES) encoded by every possible neighbor mask
+MASK_MOVES = tuple(tuple(move for move in range(4) if mask & (1 << move)) for mask in range(16))
 
-    def get(self):
-        """Returns the first node in queue"""
-        if self.empty():
-            raise Exception("Empty frontier")
-        else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
-            return node
 class Map():
     """
     Class that holds 2D Coordinate logic for robot to follow with RFID stickers.
     Has to be initialized with a text file of a map and current coordinates of robot on startup with the form (y, x)
-    If a given tile is traversible, it is stored as a "1".
-    If it has an RFID sticker associated with it, it is stored as a letter from "a" to "z"
-    Otherwise, it is stored as a "0".
+    The map is stored as a uint8 NumPy grid holding the cost class of every traversible tile (see below) and 0 for everything else,
+    along with a grid of 4-bit neighbor masks (see neighbor_masks) that the search code reads instead of checking neighbors itself.
+    RFID stickers (letters "a" to "z") are traversible tiles kept in two dictionaries, self.stickers and self.sticker_at.
+
+    Maps with more junctions than letters name them in a waypoint registry (see waypoints.py), given as waypoints or read from
+    the waypoint file next to the map file (see waypoints_path) if there is one. Waypoints are added to the sticker dictionaries,
+    so everything taking a sticker letter (find_path, find_fastest_path, cached_route...) also takes a waypoint name.
 
     Map file format: 
     "a" to "z" - RFID sticker
+    "@" - Traversible tile with a waypoint, which has to be in the waypoint registry
     "#" - Traversible tile
+    "1" to "9" - Traversible tile that is slower to drive over (carpet, crowds...), the digit being its cost class ("1" is the same as "#")
     "-" - Empty tile
+
+    Travel time costs (in seconds) used by find_fastest_path can be given on initialization or changed later:
+    forward_cost - driving over one tile of cost class 1 (driving onto a tile takes its cost class times as long),
+    turn_cost - a 90 degree turn, uturn_cost - a 180 degree turn
+
+    If routecache is given, fastest routes between every pair of letter stickers are loaded from that file (see load_route_cache),
+    or computed and written to it if the file is missing or was made for a different map file or different costs.
+    Waypoints are left out, since the cache grows with the square of the sticker count: trips to or from them are planned when needed.
+
+    If compiled is True and a compiled version of the map file made with Map.compile exists next to it (see compiled_path),
+    it is memory-mapped instead of parsing the text. Missing, corrupt or outdated compiled files are ignored.
+
+    Distance fields (see distance_field) of the field_cache most recently used destinations are kept in memory.
+
+    Changes (set_current_coords, block_tile, unblock_tile, reload) hold self.lock. Threads that plan while the map changes should query
+    a snapshot() instead of the map itself: a read-only copy that shares the map's arrays until the map changes them (copy-on-write).
+
+    Edits to the map file can be picked up while running with reload(), or automatically with watch().
     """
-    def __init__ (self, mapfile, start):
-        
-        # Interpret map file
-        with open(mapfile) as file:
-            data = file.read().splitlines()
-            self.height = len(data)
-            self.width = max(len(line) for line in data)
-
-            # Loop over rows and columns
-            self.coordinates = []
-            for i in range(self.height):
-                row = []
-                for j in range(self.width):
-                    if j >= len(data[i]): # If row shorter than longest row
-                        row.append("0")
-                    elif data[i][j] == "#": # If possible paths encountered
-                        row.append("1")
-                    elif data[i][j].isalpha(): # If junction with sticker encountered
-                        row.append(data[i][j])
-                    else:
-                        row.append("0") # Everything else
-                self.coordinates.append(row)
-
-        # Set current coords of robot on initialization
-        self.set_current_coords(start)
+    def __init__ (self, mapfile, start, forward_cost = 1.0, turn_cost = 3.0, uturn_cost = 6.0, routecache = None, compiled = True, waypoints = None, field_cache = 8):
+
+        self.forward_cost = forward_cost
+        self.turn_cost = turn_cost
+        self.uturn_cost = uturn_cost
+        self.mapfile = mapfile
+        self.compiled = compiled
+        self.routes = {}
+        self.routecache = routecache
+        self.fields = OrderedDict() # Destination sticker -> (map version, distance field), least recently used first
+        self.field_cache = field_cache
+        self.watcher = None
+        self.lock = threading.RLock() # Held by everything that changes the map
+        self.snapshots = weakref.WeakSet() # Snapshots sharing self.masks and self.blocked, which have to be copied before changing them
+        self.waypoint_source = waypoints
+        self.waypoint_tiles = [] # Coordinates of "@" tiles
+
+        self._load(mapfile, compiled)
+
+        # Temporarily blocked tiles (obstacles), and functions called with the coordinates of a tile whenever it gets blocked or unblocked
+        # (or with None after a reload that resized the map or moved stickers, meaning everything derived from the map has to be recomputed)
+        self.blocked = set()
+        self.listeners = []
+        self.version = 0 # Incremented on every change to blocked tiles, so derived data can tell when it's stale
+
+        self._add_waypoints(waypoints)
+
+        # Set current coords of robot on initialization, if known
+        self.current = None
+        if start is not None:
+            self.set_current_coords(start)
+
+        if routecache is not None:
+            self.load_route_cache(routecache)
+
+    def _load(self, mapfile, compiled):
+        """
+        Loads the map storage: sets height, width, map_hash, grid, masks, the sticker indexes,
+        flatgrid and flatmasks, views of the grid and masks indexed by flat tile index (y * width + x) that the search code reads,
+        and offsets, the flat index offsets of the moves in MOVES.
+        """
+        # Use the compiled map if there is an up to date one, interpret the text map file otherwise
+        if not (compiled and self._load_compiled(compiled_path(mapfile))):
+            self._parse_text(mapfile)
+        self.flatgrid = memoryview(self.grid.reshape(-1))
+        self.flatmasks = memoryview(self.masks.reshape(-1))
+        self.offsets = (-self.width, self.width, -1, 1)
+
+    def _add_waypoints(self, waypoints):
+        """
+        Loads the waypoint registry (a WaypointRegistry, a waypoint file, or None for the waypoint file next to the map file if it exists)
+        and adds its waypoints to the sticker dictionaries.
+        """
+        if waypoints is None:
+            path = waypoints_path(self.mapfile)
+            waypoints = WaypointRegistry(path if os.path.exists(path) else None)
+        elif isinstance(waypoints, str):
+            waypoints = WaypointRegistry(waypoints)
+        self.waypoints = waypoints
+
+        for waypoint in waypoints:
+            name, coords = waypoint.name, waypoint.coords
+            if not self.is_valid_tile(coords):
+                raise Exception(f"Waypoint '{name}' at {coords} is not on a traversible tile")
+            if self.stickers.get(name, coords) != coords or self.sticker_at.get(coords, name) != name:
+                raise Exception(f"Waypoint '{name}' at {coords} clashes with a sticker of the map")
+            self.stickers[name] = coords
+            self.sticker_at[coords] = name
+        for coords in self.waypoint_tiles:
+            if waypoints.at(coords) is None:
+                raise Exception(f"Waypoint tile at {coords} isn't in the waypoint registry")
+
+    def _search_tables(self):
+        """Returns empty (parent, action) tables for a search, indexed by flat tile index. Parent is -1 and action 0 for unvisited tiles."""
+        size = self.height * self.width
+        return array("i", [-1]) * size, bytearray(size)
+
+    def _parse_text(self, mapfile):
+        """Interprets a text map file, hashing it so caches made from it can be recognized."""
+        with open(mapfile, "rb") as file:
+            raw = file.read()
+        self.map_hash = hashlib.sha1(raw).hexdigest()
+        data = raw.decode().splitlines()
+        self.height = len(data)
+        self.width = max(len(line) for line in data)
+
+        # Pad rows shorter than the longest row with empty tiles and read characters into an array
+        text = "".join(line.ljust(self.width, "-") for line in data).encode("ascii", errors = "replace")
+        chars = np.frombuffer(text, dtype = np.uint8).reshape(self.height, self.width)
+        self.grid, letters = tile_costs(chars)
+        self.waypoint_tiles = [(int(y), int(x)) for y, x in zip(*np.nonzero(chars == ord("@")))]
+
+        # Index stickers both ways so lookups don't have to scan the grid
+        self.stickers = {} # Sticker letter -> coordinates (y, x)
+        self.sticker_at = {} # Coordinates (y, x) -> sticker letter
+        for y, x in zip(*np.nonzero(letters)):
+            tile = chr(chars[y, x])
+            coords = (int(y), int(x))
+            if tile in self.stickers:
+                raise Exception(f"Sticker '{tile}' appears more than once in {mapfile}: at {self.stickers[tile]} and {coords}")
+            self.stickers[tile] = coords
+            self.sticker_at[coords] = tile
+
+        self.masks = neighbor_masks(self.grid)
+
+    def compile(self, outfile = None):
+        """
+        Writes the map to a compiled binary file (compiled_path of the map file by default) that loads without parsing the text.
+        Blocked tiles and waypoints are not saved, only the letter stickers and the positions of "@" tiles of the map file.
+        """
+        if outfile is None:
+            outfile = compiled_path(self.mapfile)
+        stat = os.stat(self.mapfile)
+
+        waypoints = {waypoint.name for waypoint in self.waypoints}
+        records = []
+        for name, (y, x) in self.stickers.items():
+            if name in waypoints:
+                continue
+            encoded = name.encode()
+            records.append(bytes([len(encoded)]) + encoded + COMPILED_STICKER.pack(y, x))
+        tiles = b"".join(COMPILED_STICKER.pack(y, x) for y, x in self.waypoint_tiles)
+        payload = [np.ascontiguousarray(self.grid).tobytes(), neighbor_masks(self.grid).tobytes(), b"".join(records), tiles]
+        checksum = 0
+        for part in payload:
+            checksum = zlib.crc32(part, checksum)
+
+        header = COMPILED_HEADER.pack(COMPILED_MAGIC, COMPILED_VERSION, self.height, self.width, len(records), len(self.waypoint_tiles),
+                                      stat.st_size, stat.st_mtime_ns, bytes.fromhex(self.map_hash), checksum)
+        temp = outfile + ".tmp"
+        with open(temp, "wb") as file:
+            file.write(header)
+            for part in payload:
+                file.write(part)
+        os.replace(temp, outfile)
+        return outfile
+
+    def _load_compiled(self, path):
+        """
+        Memory-maps a compiled map file made by compile(). Returns False, leaving the map untouched, if the file is missing,
+        corrupt, or doesn't match the current contents of the text map file.
+        """
+        try:
+            with open(path, "rb") as file:
+                header = file.read(COMPILED_HEADER.size)
+            magic, version, height, width, count, tile_count, size, mtime, source_hash, checksum = COMPILED_HEADER.unpack(header)
+            if magic != COMPILED_MAGIC or version != COMPILED_VERSION:
+                return False
+
+            # Size and modification time are checked first, the text file only has to be hashed if they changed
+            stat = os.stat(self.mapfile)
+            if stat.st_size != size:
+                return False
+            if stat.st_mtime_ns != mtime:
+                with open(self.mapfile, "rb") as file:
+                    if hashlib.sha1(file.read()).digest() != source_hash:
+                        return False
+
+            # Copy-on-write mapping, so blocking tiles changes the masks in memory only
+            data = np.memmap(path, dtype = np.uint8, mode = "c", offset = COMPILED_HEADER.size)
+            if zlib.crc32(data) != checksum:
+                return False
+        except (OSError, struct.error, ValueError):
+            return False
+
+        tiles = height * width
+        grid = data[:tiles].reshape(height, width)
+        masks = data[tiles:2 * tiles].reshape(height, width)
+        stickers = {}
+        sticker_at = {}
+        records = data[2 * tiles:].tobytes()
+        offset = 0
+        for _ in range(count):
+            length = records[offset]
+            name = records[offset + 1:offset + 1 + length].decode()
+            offset += 1 + length
+            y, x = COMPILED_STICKER.unpack_from(records, offset)
+            offset += COMPILED_STICKER.size
+            stickers[name] = (y, x)
+            sticker_at[(y, x)] = name
+        waypoint_tiles = [COMPILED_STICKER.unpack_from(records, offset + i * COMPILED_STICKER.size) for i in range(tile_count)]
+
+        self.height = height
+        self.width = width
+        self.map_hash = source_hash.hex()
+        self.grid = grid
+        self.masks = masks
+        self.stickers = stickers
+        self.sticker_at = sticker_at
+        self.waypoint_tiles = waypoint_tiles
+        return True
 
     def print(self):
         """Prints current map assignment to terminal."""
-        for i in range(self.height):
-            for j in range(self.width):
-                letter = self.coordinates[i][j]
-                if letter != "0":
-                    if letter.isalpha():
-                        print(letter, end="")
-                    else:
-                        print("#", end="")
-                else:
-                    print(" ", end="")
-            print()
+        chars = np.where(self.grid > 1, self.grid + ord("0"), np.where(self.grid != 0, ord("#"), ord(" "))).astype(np.uint8)
+        for (y, x), sticker in self.sticker_at.items():
+            chars[y, x] = ord(sticker) if len(sticker) == 1 else ord("@")
+        for row in chars:
+            print(row.tobytes().decode())
 
     def connections(self, coords):
         """
         Returns a set of connections to any given tile with the input coordinates (y, x).
         Each element in the set is a set itself, consisting of two elements: (coordinates of neighbor, action required to reach it).
         """
-        i, j = coords
+        y, x = coords
         connections = set()
-        if i >= 1:
-            if self.coordinates[i - 1][j] != "0":
-                connections.add(((i - 1, j), "up"))
-        if i <= (self.height - 2):
-            if self.coordinates[i + 1][j] != "0":
-                connections.add(((i + 1, j), "down"))
-        if j >= 1:
-            if self.coordinates[i][j - 1] != "0":
-                connections.add(((i, j - 1), "left"))
-        if j <= (self.width - 2):
-            if self.coordinates[i][j + 1] != "0":
-                connections.add(((i, j + 1), "right"))
+        for move in MASK_MOVES[self.masks[y, x]]:
+            dy, dx, action = MOVES[move]
+            connections.add(((y + dy, x + dx), action))
 
         return connections
 
     def get_coords_of_sticker(self, sticker):
-        """Returns coordinates of given sticker based on its letter representation, returns None if invalid sticker"""
-        for y in range(self.height):
-            for x in range(self.width):
-                if self.coordinates[y][x] == sticker:
-                    return (y, x) 
-        
-        return None
+        """Returns coordinates of given sticker based on its letter representation (or waypoint name), returns None if invalid sticker"""
+        return self.stickers.get(sticker)
 
     def is_sticker(self, coords):
         """
         Checks whether a given tile with the formula (y, x) has an RFID sticker associated with it.
-        Returns sticker letter from "a" to "z" if it does, False if it does not.
+        Returns sticker letter from "a" to "z" (or the waypoint name) if it does, None if it does not.
         """
-        if self.is_valid_tile(coords):
-            y, x = coords
-            letter = self.coordinates[y][x]
-            if letter.isalpha():
-                return letter
-
-        return None
+        return self.sticker_at.get(tuple(coords))
 
     def set_current_coords(self, coords):
         """Sets given coordinates to be current stored coordinates in map class"""
-        if self.is_valid_tile(coords):
-            self.current = coords
-            return
-        else:
-            raise Exception("Coordinates outside of map limits")
+        with self.lock:
+            if self.is_valid_tile(coords):
+                self.current = coords
+                return
+            else:
+                raise Exception("Coordinates outside of map limits")
 
     def is_valid_tile(self, coords):
-        """Checks whether input tile is traversible. Returns True if it is, False if it is out of bounds."""
+        """Checks whether input tile is traversible. Returns True if it is, False if it is empty, blocked or out of bounds."""
         y, x = coords
+        return 0 <= y < self.height and 0 <= x < self.width and self.grid[y, x] != 0 and (y, x) not in self.blocked
 
-        # NOTE: self.height and self.width are a number 1 larger than the available indexes in the coordinate list
-        if y <= (self.height - 1) and x <= (self.width - 1) and self.coordinates[y][x] != "0":
-            return True
-        else:
-            return False
+    def block_tile(self, coords):
+        """Marks a traversible tile with the formula (y, x) as temporarily blocked, so no path goes through it until unblock_tile is called."""
+        coords = tuple(coords)
+        with self.lock:
+            if not self.is_valid_tile(coords):
+                raise Exception(f"{coords} is not a traversible tile")
+            if coords == self.current:
+                raise Exception("Can't block the tile the robot is standing on")
+            self._unshare()
+            self.blocked.add(coords)
+            self._tile_changed(coords)
+
+    def unblock_tile(self, coords):
+        """Clears a tile blocked with block_tile."""
+        coords = tuple(coords)
+        with self.lock:
+            if coords not in self.blocked:
+                raise Exception(f"{coords} is not blocked")
+            self._unshare()
+            self.blocked.discard(coords)
+            self._tile_changed(coords)
+
+    def snapshot(self):
+        """
+        Returns a MapSnapshot of the map as it is now. Taking one copies nothing, the map copies its neighbor masks and blocked tiles
+        the next time it changes them while a snapshot still uses them.
+        """
+        with self.lock:
+            snapshot = MapSnapshot(self)
+            self.snapshots.add(snapshot)
+            return snapshot
+
+    def _unshare(self):
+        """Copies the neighbor masks and blocked tiles if a snapshot still uses them, so changing them doesn't change the snapshot."""
+        if len(self.snapshots):
+            self.masks = self.masks.copy()
+            self.flatmasks = memoryview(self.masks.reshape(-1))
+            self.blocked = set(self.blocked)
+            self.snapshots = weakref.WeakSet()
+
+    def _tile_changed(self, coords):
+        """Recomputes neighbor masks around a tile that was blocked or unblocked and notifies listeners."""
+        self._update_masks(coords)
+        self.version += 1
+        for listener in self.listeners:
+            listener(coords)
+
+    def _update_masks(self, coords):
+        """Recomputes the neighbor masks of a tile and the four tiles around it from the grid and the blocked tiles."""
+        y, x = coords
+        for my, mx in ((y, x), (y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+            if 0 <= my < self.height and 0 <= mx < self.width:
+                mask = 0
+                if (my, mx) not in self.blocked:
+                    for move, (dy, dx, _) in enumerate(MOVES):
+                        if self.is_valid_tile((my + dy, mx + dx)):
+                            mask |= 1 << move
+                self.masks[my, mx] = mask
+
+    def reload(self):
+        """
+        Reads the map file again after it was edited, keeping as much derived data as possible.
+        The old and new grids are compared and only cached routes that could have changed are dropped and recomputed:
+        routes to or from stickers that moved or disappeared, routes over tiles that were removed or changed cost, and routes that a new
+        or cheaper tile could shorten (when going through it isn't ruled out by the Manhattan distance). Blocked tiles that still exist stay blocked,
+        and the current coordinates are kept if they are still traversible (otherwise they are cleared and have to be set again).
+        Cached routes are computed on the new map without its blocked tiles, so temporary obstacles don't end up in the route cache.
+        Listeners are called for every changed tile, or once with None if the map size changed or stickers moved.
+        Returns the set of changed tile coordinates, or None if the map size changed.
+        """
+        with self.lock:
+            fresh = Map(self.mapfile, None, self.forward_cost, self.turn_cost, self.uturn_cost, compiled = self.compiled, waypoints = self.waypoint_source)
+            if fresh.map_hash == self.map_hash and fresh.stickers == self.stickers:
+                self.waypoints = fresh.waypoints # Only UIDs of waypoints may have changed, which no derived data depends on
+                return set()
+
+            # Tiles that were added, removed or changed cost, and stickers that moved, appeared or disappeared
+            resized = fresh.grid.shape != self.grid.shape
+            moved = {name for name in self.stickers.keys() | fresh.stickers.keys() if self.stickers.get(name) != fresh.stickers.get(name)}
+            if resized:
+                changed = None
+                routes = {}
+            else:
+                difference = fresh.grid != self.grid
+                changed = {(int(y), int(x)) for y, x in zip(*np.nonzero(difference))}
+                cheaper = difference & (fresh.grid != 0) & ((self.grid == 0) | (fresh.grid < self.grid)) # Tiles a route could newly go over
+                added = [(int(y), int(x)) for y, x in zip(*np.nonzero(cheaper))]
+                self.routes = dict(self.routes) # Snapshots may still use the old routes
+                self._invalidate_routes(changed, added, moved)
+                routes = self.routes
+
+            # Recompute the dropped routes on the new map, which has no blocked tiles yet
+            if routes or self.routecache is not None:
+                fresh.routes = routes
+                fresh._fill_routes()
+            self.routes = routes
+
+            # Swap in the new storage, then reapply blocked tiles that still exist
+            self.height = fresh.height
+            self.width = fresh.width
+            self.offsets = fresh.offsets
+            self.map_hash = fresh.map_hash
+            self.grid = fresh.grid
+            self.flatgrid = fresh.flatgrid
+            self.masks = fresh.masks
+            self.stickers = fresh.stickers
+            self.sticker_at = fresh.sticker_at
+            self.waypoints = fresh.waypoints
+            self.blocked = {(y, x) for y, x in self.blocked if y < self.height and x < self.width and self.grid[y, x] != 0}
+            for coords in self.blocked:
+                self._update_masks(coords)
+            self.flatmasks = memoryview(self.masks.reshape(-1))
+            self.snapshots = weakref.WeakSet() # Everything snapshots could share was replaced
+
+            if self.current is not None and not self.is_valid_tile(self.current):
+                print(f"Current coordinates {self.current} are no longer on the map")
+                self.current = None
+
+            self.version += 1
+            if self.routecache is not None:
+                self.save_route_cache(self.routecache)
+
+            # Tile indexes and sticker positions listeners keep are meaningless after a resize or a sticker move, so they start over
+            if resized or moved:
+                for listener in self.listeners:
+                    listener(None)
+            elif changed:
+                for coords in changed:
+                    for listener in self.listeners:
+                        listener(coords)
+            return changed
+
+    def _invalidate_routes(self, changed, added, moved):
+        """
+        Drops cached routes made invalid by a map edit: routes touching a sticker in moved, routes driving over a changed tile,
+        and routes that could become faster by going over one of the added (new or cheaper) tiles.
+        """
+        for key, (time, moves) in list(self.routes.items()):
+            start, _, end = key.split(" ")
+            if start in moved or end in moved:
+                del self.routes[key]
+                continue
+
+            # Tiles the route drives over
+            y, x = self.stickers[start]
+            tiles = set()
+            for letter in moves:
+                dy, dx, _ = MOVES[MOVE_LETTERS.index(letter)]
+                y, x = y + dy, x + dx
+                tiles.add((y, x))
+            if not tiles.isdisjoint(changed):
+                del self.routes[key]
+                continue
+
+            # A detour over a new tile takes at least the Manhattan distance there and on to the end times the cost of the cheapest tile
+            (sy, sx), (ey, ex) = self.stickers[start], self.stickers[end]
+            limit = time / self.forward_cost if self.forward_cost > 0 else float("inf")
+            for y, x in added:
+                if abs(y - sy) + abs(x - sx) + abs(ey - y) + abs(ex - x) <= limit:
+                    del self.routes[key]
+                    break
+
+    def waypoint_file(self):
+        """Returns the path of the waypoint file the registry is read from, or None if it was given as a WaypointRegistry."""
+        if self.waypoint_source is None:
+            return waypoints_path(self.mapfile)
+        if isinstance(self.waypoint_source, str):
+            return self.waypoint_source
+        return None
+
+    def watch(self, interval = 1.0):
+        """Starts a background thread that calls reload() whenever the size or modification time of the map file or the waypoint file changes."""
+        if self.watcher is not None:
+            return
+        self.watcher = MapWatcher(self, interval)
+        self.watcher.start()
+
+    def stop_watching(self):
+        """Stops the thread started by watch()."""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher.join()
+            self.watcher = None
 
     def find_path(self, sticker):
         """
@@ -157,61 +529,495 @@ class Map():
         end = self.get_coords_of_sticker(sticker)
         if end is None:
             raise Exception(f"'{sticker}' is not a valid sticker")
-            
-        # Create a start node and add it to queue for inspection
-        start = Node(state = self.current, parent = None, action = None)
-        queue = NodeQueue()
-        queue.add(start)
-        
-        # Initialize empty set of explored tiles
-        explored = set()
-
-        # Loop runs until either solution is found, or all options were explored
-        while True:
-
-            if queue.empty():
+
+        width = self.width
+        start = self.current[0] * width + self.current[1]
+        goal = end[0] * width + end[1]
+        if start == goal:
+            return []
+
+        parent, action, found = self._search(start, {goal})
+        if goal not in found:
+            return None
+        return self._trace_path(parent, action, start, goal)
+
+    def find_paths(self, stickers):
+        """
+        Finds the shortest paths from current node to several stickers with a single BFS expansion.
+        Returns a dictionary of sticker -> path in the same format as find_path, None for stickers that can't be reached.
+        """
+        width = self.width
+        start = self.current[0] * width + self.current[1]
+        goals = {}
+        for sticker in stickers:
+            end = self.get_coords_of_sticker(sticker)
+            if end is None:
+                raise Exception(f"'{sticker}' is not a valid sticker")
+            goals[sticker] = end[0] * width + end[1]
+
+        parent, action, found = self._search(start, set(goals.values()) - {start})
+        paths = {}
+        for sticker, goal in goals.items():
+            if goal == start:
+                paths[sticker] = []
+            elif goal in found:
+                paths[sticker] = self._trace_path(parent, action, start, goal)
+            else:
+                paths[sticker] = None
+        return paths
+
+    def distances_from_current(self):
+        """Returns a dictionary of every reachable sticker -> number of tiles to drive to it from current node, using a single BFS expansion."""
+        width = self.width
+        start = self.current[0] * width + self.current[1]
+        goals = {y * width + x: sticker for (y, x), sticker in self.sticker_at.items()}
+        parent, _, found = self._search(start, set(goals) - {start})
+
+        distances = {goals[start]: 0} if start in goals else {}
+        for goal in found:
+            distance = 0
+            index = goal
+            while index != start:
+                index = parent[index]
+                distance += 1
+            distances[goals[goal]] = distance
+        return distances
+
+    def find_fastest_paths(self, stickers, heading, coords = None):
+        """
+        Same as find_fastest_path for several stickers at once, from a single Dijkstra expansion.
+        Starts from coords (y, x) instead of the current coordinates if given, e.g. to plan legs of a tour.
+        Returns a dictionary of sticker -> (path, predicted trip time in seconds), None for stickers that can't be reached.
+        """
+        if heading not in HEADINGS:
+            raise Exception(f"'{heading}' is not a valid heading")
+        if coords is None:
+            coords = self.current
+        width = self.width
+        start = coords[0] * width + coords[1]
+        goals = {}
+        for sticker in stickers:
+            end = self.get_coords_of_sticker(sticker)
+            if end is None:
+                raise Exception(f"'{sticker}' is not a valid sticker")
+            goals[sticker] = end[0] * width + end[1]
+
+        parent, found = self._fastest_search(start, HEADINGS[heading], set(goals.values()) - {start})
+        routes = {}
+        for sticker, goal in goals.items():
+            if goal == start:
+                routes[sticker] = ([], 0.0)
+            elif goal in found:
+                state, time = found[goal]
+                routes[sticker] = (self._trace_state_path(parent, start * 4 + HEADINGS[heading], state), time)
+            else:
+                routes[sticker] = None
+        return routes
+
+    def distance_field(self, sticker):
+        """
+        Returns a flat int32 array (indexed by y * width + x) holding, for every tile, the cost of driving from it to a sticker:
+        the sum of the cost classes of the tiles driven onto, ignoring turns. Tiles that can't reach the sticker hold UNREACHABLE.
+        Fields are cached per sticker, and recomputed once tiles were blocked, unblocked or the map was reloaded.
+        """
+        end = self.get_coords_of_sticker(sticker)
+        if end is None:
+            raise Exception(f"'{sticker}' is not a valid sticker")
+        cached = self.fields.get(sticker)
+        if cached is not None and cached[0] == self.version:
+            self.fields.move_to_end(sticker)
+            return cached[1]
+
+        field = self._wavefront(end[0] * self.width + end[1])
+        self.fields[sticker] = (self.version, field)
+        self.fields.move_to_end(sticker)
+        while len(self.fields) > self.field_cache:
+            self.fields.popitem(last = False)
+        return field
+
+    def _wavefront(self, goal):
+        """
+        Computes the distance field towards flat tile index goal with a wavefront that expands all tiles at the same distance at once.
+        Tile costs are small whole numbers, so tiles waiting to be expanded are kept in buckets by distance (Dial's algorithm).
+        """
+        width = self.width
+        masks = self.masks.reshape(-1)
+        costs = self.grid.reshape(-1).astype(np.int32)
+        field = np.full(self.height * width, UNREACHABLE, dtype = np.int32)
+        field[goal] = 0
+        buckets = {0: [np.array([goal])]} # Distance -> arrays of tiles reached with that distance
+
+        while buckets:
+            distance = min(buckets)
+            tiles = np.unique(np.concatenate(buckets.pop(distance)))
+            tiles = tiles[field[tiles] == distance] # Drop tiles reached with a lower distance after they were put in this bucket
+            if len(tiles) == 0:
+                continue
+
+            # Driving from a neighbor onto one of these tiles costs the tile's cost class
+            reached = distance + costs[tiles]
+            tile_masks = masks[tiles]
+            for move, offset in enumerate((-width, width, -1, 1)):
+                has = (tile_masks & (1 << move)) != 0
+                neighbors = tiles[has] + offset
+                values = reached[has]
+                better = values < field[neighbors]
+                neighbors = neighbors[better]
+                values = values[better]
+                np.minimum.at(field, neighbors, values)
+                for value in np.unique(values).tolist():
+                    buckets.setdefault(value, []).append(neighbors[values == value])
+
+        return field
+
+    def field_path(self, sticker, coords = None):
+        """
+        Finds the cheapest path from coords (the current coordinates by default) to a sticker by walking down its distance field,
+        which takes no search once the field is cached. Returns a path in the same format as find_path, None if the sticker can't be reached.
+        """
+        if coords is None:
+            coords = self.current
+        field = memoryview(self.distance_field(sticker))
+        masks = self.flatmasks
+        costs = self.flatgrid
+        width = self.width
+        offsets = self.offsets
+        index = coords[0] * width + coords[1]
+        if field[index] == UNREACHABLE:
+            return None
+
+        # Every step goes to the neighbor whose distance plus the cost of driving onto it is lowest, which is one less step from the goal
+        path = []
+        while field[index] != 0:
+            best = None
+            for move in MASK_MOVES[masks[index]]:
+                neighbor = index + offsets[move]
+                value = field[neighbor] + costs[neighbor]
+                if best is None or value < best[0]:
+                    best = (value, move)
+            index += offsets[best[1]]
+            path.append([divmod(index, width), MOVES[best[1]][2]])
+        return path
+
+    def _search(self, start, goals):
+        """
+        Runs a BFS from flat tile index start until every flat tile index in goals was reached or everything reachable was explored.
+        Returns a tuple (parent array, action array, set of reached goals). The arrays are indexed by tile, parent being -1 for unvisited tiles
+        and action holding the index of the move in MOVES used to reach the tile.
+        """
+        masks = self.flatmasks
+        offsets = self.offsets
+        remaining = set(goals)
+        found = set()
+
+        parent, action = self._search_tables()
+        parent[start] = start
+        queue = deque((start,))
+
+        # Loop runs until all goals are found, or all options were explored
+        while queue and remaining:
+            index = queue.popleft()
+            for move in MASK_MOVES[masks[index]]:
+                neighbor = index + offsets[move]
+                if parent[neighbor] == -1:
+                    parent[neighbor] = index
+                    action[neighbor] = move
+                    if neighbor in remaining:
+                        remaining.discard(neighbor)
+                        found.add(neighbor)
+                    queue.append(neighbor)
+
+        return parent, action, found
+
+    def _trace_path(self, parent, action, start, goal):
+        """Walks back parent-by-parent from goal to start and returns the path in [coordinates, direction] format."""
+        path = []
+        index = goal
+        while index != start:
+            path.append([divmod(index, self.width), MOVES[action[index]][2]])
+            index = parent[index]
+
+        # Reverse list of solutions so they go from beginning-to-end instead of from end-to-beginning
+        path.reverse()
+        return path
+
+    def find_fastest_path(self, sticker, heading):
+        """
+        Finds the path from current node to an end sticker that takes the least time, taking turns and slow tiles into account.
+        Uses A* over (tile, heading) states, starting from the given heading ("up", "down", "left" or "right").
+        Returns a tuple (path, predicted trip time in seconds), path being in the same format as find_path. Returns None if unreachable.
+        """
+        # Check whether desired end sticker exists
+        end = self.get_coords_of_sticker(sticker)
+        if end is None:
+            raise Exception(f"'{sticker}' is not a valid sticker")
+        if heading not in HEADINGS:
+            raise Exception(f"'{heading}' is not a valid heading")
+
+        width = self.width
+        start = self.current[0] * width + self.current[1]
+        goal = end[0] * width + end[1]
+        if start == goal:
+            return [], 0.0
+
+        parent, found = self._fastest_search(start, HEADINGS[heading], {goal})
+        if goal not in found:
+            return None
+        state, time = found[goal]
+        return self._trace_state_path(parent, start * 4 + HEADINGS[heading], state), time
+
+    def _fastest_search(self, start, heading, goals):
+        """
+        Runs Dijkstra's algorithm over (tile, heading) states from flat tile index start facing heading (index into MOVES),
+        until every flat tile index in goals has been reached or everything reachable was explored.
+        With a single goal the search is guided towards it (A*) by the Manhattan distance times forward_cost, which never
+        overestimates the remaining time since no tile is cheaper than cost class 1.
+        Returns a tuple (parent table keyed by state, dictionary of reached goal -> (final state, time)). States are tile * 4 + heading.
+        """
+        width = self.width
+        masks = self.flatmasks
+        costs = self.flatgrid
+        offsets = self.offsets
+        start = start * 4 + heading
+        remaining = set(goals)
+        found = {}
+
+        # Cost of changing from one heading to another, indexed [current heading][new heading]
+        forward = self.forward_cost
+        turns = [[0.0 if a == b else self.uturn_cost if OPPOSITE[a] == b else self.turn_cost for b in range(4)] for a in range(4)]
+
+        # Lower bound of the time left to the goal, zero when searching for several goals
+        if len(remaining) == 1:
+            goal_y, goal_x = divmod(next(iter(remaining)), width)
+            def estimate(index):
+                y, x = divmod(index, width)
+                return (abs(y - goal_y) + abs(x - goal_x)) * forward
+        else:
+            def estimate(index):
+                return 0.0
+
+        # Tables keyed by state (tile * 4 + heading): best known time and previous state. The heap is ordered by time plus estimate.
+        best = {start: 0.0}
+        parent = {start: start}
+        heap = [(estimate(start // 4), start)]
+
+        while heap and remaining:
+            priority, state = heapq.heappop(heap)
+            index, current = divmod(state, 4)
+            time = best[state]
+            if priority > time + estimate(index):
+                continue
+            if index in remaining:
+                remaining.discard(index)
+                found[index] = (state, time)
+
+            for move in MASK_MOVES[masks[index]]:
+                neighbor = index + offsets[move]
+                child = neighbor * 4 + move
+                cost = time + forward * costs[neighbor] + turns[current][move]
+                if cost < best.get(child, float("inf")):
+                    best[child] = cost
+                    parent[child] = state
+                    heapq.heappush(heap, (cost + estimate(neighbor), child))
+
+        return parent, found
+
+    def _trace_state_path(self, parent, start, state):
+        """Walks back through (tile, heading) states from state to start and returns the path in [coordinates, direction] format."""
+        path = []
+        while state != start:
+            index, move = divmod(state, 4)
+            path.append([divmod(index, self.width), MOVES[move][2]])
+            state = parent[state]
+        path.reverse()
+        return path
+
+    def build_route_cache(self):
+        """
+        Computes the fastest route between every pair of letter stickers for every starting heading and stores them in self.routes,
+        keyed by "start heading end" (e.g. "b left g"). Each value is [trip time in seconds, moves as a string of letters from MOVE_LETTERS].
+        """
+        self.routes = {}
+        self._fill_routes()
+
+    def _fill_routes(self):
+        """Computes the routes missing from self.routes, searching only from the stickers and headings that have some missing."""
+        width = self.width
+        stickers = {name: coords for name, coords in self.stickers.items() if name not in self.waypoints}
+        for sticker, (y, x) in stickers.items():
+            start = y * width + x
+            for heading in range(4):
+                prefix = f"{sticker} {MOVES[heading][2]} "
+                goals = {gy * width + gx for end, (gy, gx) in stickers.items() if end != sticker and prefix + end not in self.routes}
+                if not goals:
+                    continue
+                parent, found = self._fastest_search(start, heading, goals)
+                for goal, (state, time) in found.items():
+                    path = self._trace_state_path(parent, start * 4 + heading, state)
+                    moves = "".join(MOVE_LETTERS[HEADINGS[direction]] for _, direction in path)
+                    self.routes[prefix + self.sticker_at[divmod(goal, width)]] = [time, moves]
+
+    def _route_cache_key(self):
+        """Returns what a route cache file has to match to be valid for this map: its file hash and the travel costs."""
+        return {"map_hash": self.map_hash, "costs": [self.forward_cost, self.turn_cost, self.uturn_cost]}
+
+    def load_route_cache(self, cachefile):
+        """
+        Loads sticker-to-sticker routes from a JSON cache file into self.routes.
+        If the file is missing, unreadable or was made for a different map file or different costs, routes are rebuilt and the file is rewritten.
+        """
+        try:
+            with open(cachefile) as file:
+                cache = json.load(file)
+            if cache["key"] == self._route_cache_key():
+                self.routes = cache["routes"]
+                return
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        self.build_route_cache()
+        self.save_route_cache(cachefile)
+
+    def save_route_cache(self, cachefile):
+        """Writes self.routes to a JSON cache file, replacing it atomically so a crash can't leave a half-written cache behind."""
+        temp = cachefile + ".tmp"
+        with open(temp, "w") as file:
+            json.dump({"key": self._route_cache_key(), "routes": self.routes}, file)
+        os.replace(temp, cachefile)
+
+    def cached_route(self, sticker, heading):
+        """
+        Looks up the fastest route from the current coordinates to a sticker in the route cache.
+        Only works between letter stickers, when the robot currently stands on one. Returns a tuple (path, predicted trip time in seconds)
+        in the same format as find_fastest_path, or None if the route isn't cached.
+        """
+        start = self.sticker_at.get(self.current)
+        if start is None:
+            return None
+        if start == sticker:
+            return [], 0.0
+        route = self.routes.get(f"{start} {heading} {sticker}")
+        if route is None:
+            return None
+
+        # Replay the stored moves from the current coordinates
+        time, moves = route
+        path = []
+        y, x = self.current
+        for letter in moves:
+            dy, dx, direction = MOVES[MOVE_LETTERS.index(letter)]
+            y, x = y + dy, x + dx
+            if (y, x) in self.blocked:
                 return None
-            
-            # Pick oldest node in queue, set it to explored and get its neighboring nodes
-            node = queue.get()
-            explored.add(node)
-            neighbors = self.connections(node.state)
-
-            # Unpack all neighbors
-            for coords, direction in neighbors:
-
-                # If neighboring node is the requested destination
-                if coords == end:
-                    
-                    # Initialize empty lists to store solution
-                    path = []
-                    coordinateList = []
-                    moveList = []
-
-                    # Add the newest node (the goal) to the solution first
-                    coordinateList.append(coords)
-                    moveList.append(direction)
-
-                    # Start going back parent-by-parent, appending each state and move to the lists
-                    while node.parent != None:
-                        coordinateList.append(node.state)
-                        moveList.append(node.action)
-                        node = node.parent
-                    
-                    # Reverse list of solutions so they go from beginning-to-end instead of from end-to-beginning
-                    coordinateList.reverse()
-                    moveList.reverse()
-
-                    # Add list of coordinates and moves to solution and return it
-                    for i in range(len(coordinateList)):
-                        path.append([])
-                        path[i] = [coordinateList[i], moveList[i]]
-                    return path
-
-                # If neighboring node is not in queue yet, and is unexplored, add it to queue
-                elif not queue.contains_state(coords) and coords not in explored:
-                    child = Node(state = coords, parent = node, action = direction)
-                    queue.add(child)
+            path.append([(y, x), direction])
+        return path, time
+
+class MapSnapshot(Map):
+    """
+    Read-only copy of a Map at the moment Map.snapshot() was called, with the same query methods (find_path, find_fastest_path,
+    cached_route, field_path...). Queries don't take locks, since nothing a snapshot uses is ever changed in place.
+    Snapshots can be sent to other processes (e.g. with multiprocessing), which get their own copy of the arrays.
+
+    :param map: Map to copy
+    """
+    def __init__(self, map):
+
+        self.__dict__.update(map.__dict__)
+        self.fields = OrderedDict() # Distance fields are cached per snapshot
+        self.listeners = ()
+        self.watcher = None
+        self.routecache = None
+        self.lock = None
+        self.snapshots = None
+        self.source = map.source if isinstance(map, MapSnapshot) else weakref.ref(map) # Map the arrays are shared with
+
+    def at(self, coords):
+        """Returns a snapshot of the same map state with the robot at other coordinates, e.g. to predict trips starting elsewhere."""
+        if not self.is_valid_tile(coords):
+            raise Exception("Coordinates outside of map limits")
+        snapshot = MapSnapshot(self)
+        snapshot.current = tuple(coords)
+
+        # The new snapshot shares the arrays too, so the map has to know about it in case this snapshot is freed first
+        source = self.source() if self.source is not None else None
+        if source is not None:
+            with source.lock:
+                if source.masks is self.masks:
+                    source.snapshots.add(snapshot)
+        return snapshot
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["flatgrid"], state["flatmasks"]
+        state["source"] = None # Unpickled snapshots have their own arrays
+        state["grid"] = np.asarray(self.grid)
+        state["masks"] = np.asarray(self.masks)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.flatgrid = memoryview(self.grid.reshape(-1))
+        self.flatmasks = memoryview(self.masks.reshape(-1))
+
+    def snapshot(self):
+        """Returns the snapshot itself, it never changes."""
+        return self
+
+    def _read_only(self, *args, **kwargs):
+        raise Exception("Map snapshots are read-only, change the Map they were taken from")
+
+    set_current_coords = block_tile = unblock_tile = reload = watch = stop_watching = compile = _read_only
+    build_route_cache = load_route_cache = save_route_cache = _fill_routes = _add_waypoints = _unshare = _tile_changed = _read_only
+
+class MapWatcher(threading.Thread):
+    """
+    Thread polling a map file and its waypoint file for changes and reloading the map when one of them was edited.
+
+    :param map: Map to reload
+    :param interval: Seconds between checks of the file
+    """
+    def __init__(self, map, interval = 1.0):
+
+        super(MapWatcher, self).__init__(daemon = True)
+        self.map = map
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def _versions(self):
+        """Returns the (size, modification time) of the map file and of the waypoint file, None for a waypoint file that doesn't exist."""
+        stat = os.stat(self.map.mapfile)
+        versions = [(stat.st_size, stat.st_mtime_ns), None]
+        path = self.map.waypoint_file()
+        if path is not None and os.path.exists(path):
+            stat = os.stat(path)
+            versions[1] = (stat.st_size, stat.st_mtime_ns)
+        return versions
+
+    def run(self):
+        seen = self._versions()
+        while not self.stopped.wait(self.interval):
+            try:
+                versions = self._versions()
+                if versions == seen:
+                    continue
+                seen = versions
+                changed = self.map.reload()
+            except Exception as error: # A half-written or broken file, try again on the next change
+                print(f"Couldn't reload {self.map.mapfile}: {error}")
+                continue
+            print(f"Reloaded {self.map.mapfile}: " + ("map size changed" if changed is None else f"{len(changed)} tiles changed"))
+
+    def stop(self):
+        """Stops polling."""
+        self.stopped.set()
+
+# Compile a map file for fast loading: python mapping.py compile <map file> [output file]
+if __name__ == "__main__":
+    if len(sys.argv) in (3, 4) and sys.argv[1] == "compile":
+        samplemap = Map(sys.argv[2], None, compiled = False)
+        print(f"Compiled {sys.argv[2]} to {samplemap.compile(sys.argv[3] if len(sys.argv) == 4 else None)}")
+    else:
+        print("Usage: python mapping.py compile <map file> [output file]")
 
 #samplemap = Map("map1.txt", (2,5))
-#print(samplemap.find_path("g"))
\ No newline at end of file
+#print(samplemap.find_path("g"))
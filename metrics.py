@@ -0,0 +1,47 @@
+# Latency metrics: keeps the most recent timings of named events and summarizes them
+# Used to measure how quickly the robot reacts, e.g. how long voice commands wait before they are handled.
+
+import threading
+from collections import deque
+
+class LatencyRecorder():
+    """
+    Records durations (in seconds) under a name, keeping the last limit samples of every name.
+
+    :param limit: Amount of samples kept per name
+    """
+    def __init__(self, limit = 1000):
+
+        self.limit = limit
+        self.samples = {} # Name -> deque of durations
+        self.lock = threading.Lock() # Samples come from several threads
+
+    def record(self, name, seconds):
+        """Adds a duration to the samples of a name."""
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen = self.limit)
+            samples.append(seconds)
+
+    def summary(self):
+        """Returns a dictionary of name -> dictionary with the count, mean, median (p50), p95 and max of the samples, in seconds."""
+        with self.lock:
+            samples = {name: sorted(values) for name, values in self.samples.items()}
+        summary = {}
+        for name, values in samples.items():
+            count = len(values)
+            summary[name] = {
+                "count": count,
+                "mean": sum(values) / count,
+                "p50": values[count // 2],
+                "p95": values[min(count - 1, int(count * 0.95))],
+                "max": values[-1],
+            }
+        return summary
+
+    def report(self):
+        """Prints the summary, one line per name in milliseconds."""
+        for name, stats in sorted(self.summary().items()):
+            print(f"{name:>24}: {stats['count']:>5} samples, mean {stats['mean'] * 1000:.1f} ms, p50 {stats['p50'] * 1000:.1f} ms, "
+                  f"p95 {stats['p95'] * 1000:.1f} ms, max {stats['max'] * 1000:.1f} ms")
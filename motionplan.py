@@ -0,0 +1,57 @@
+# Motion plans: compact versions of tile paths that the robot can execute segment by segment
+# A path from Map.find_path has one entry per tile, but the robot only has to act when it turns or reads a sticker.
+# compile_plan collapses the path into segments like "turn clockwise, then drive until sticker c".
+
+from mapping import HEADINGS
+
+# Headings in clockwise order, used to name turns
+CLOCKWISE = ("up", "right", "down", "left")
+
+def turn_between(current, new):
+    """Returns the turn from one heading to another: None, "cw", "ccw" or "uturn"."""
+    steps = (CLOCKWISE.index(new) - CLOCKWISE.index(current)) % 4
+    return (None, "cw", "uturn", "ccw")[steps]
+
+class Segment():
+    """
+    One straight part of a motion plan: turn to face direction, then drive tiles tiles in a straight line to end (y, x).
+    The end is confirmed by reading sticker there. Segments ending on a tile without a sticker can't be confirmed,
+    so they are driven for time seconds, the driving time (without the turn) predicted from the travel costs of the map.
+    """
+    __slots__ = ("turn", "direction", "tiles", "end", "sticker", "time")
+
+    def __init__(self, turn, direction, tiles, end, sticker, time):
+        self.turn = turn
+        self.direction = direction
+        self.tiles = tiles
+        self.end = end
+        self.sticker = sticker
+        self.time = time
+
+    def __repr__(self):
+        until = f"sticker {self.sticker}" if self.sticker is not None else f"{self.time:.1f} s"
+        return f"Segment({self.turn or 'straight'}, {self.direction} {self.tiles} tiles until {until} at {self.end})"
+
+def compile_plan(map, path, heading):
+    """
+    Compiles a path in the [coordinates, direction] format of Map.find_path, driven starting with the given heading,
+    into a list of Segments. A new segment starts wherever the direction changes and after every sticker on the way.
+    """
+    if heading not in HEADINGS:
+        raise Exception(f"'{heading}' is not a valid heading")
+    plan = []
+    current = heading
+    segment = None
+    for coords, direction in path:
+        if segment is None or direction != segment.direction:
+            segment = Segment(turn_between(current, direction), direction, 0, None, None, 0.0)
+            plan.append(segment)
+            current = direction
+        segment.tiles += 1
+        segment.end = tuple(coords)
+        segment.time += map.forward_cost * int(map.grid[coords[0], coords[1]])
+        sticker = map.is_sticker(coords)
+        if sticker is not None:
+            segment.sticker = sticker
+            segment = None
+    return plan
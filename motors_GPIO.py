@@ -224,6 +224,7 @@ class Motor:
     def set_speed(self, dc):
         """Sets duty cycle of PWM to amount between 0 and 100"""
         self.pwm.ChangeDutyCycle(dc)
+        self.speed = dc # Current duty cycle
         return
 
 
@@ -1,187 +1,269 @@
 from threading import Thread
-from queue import Queue
+from queue import Queue, Empty
 from time import sleep
+from time import perf_counter as timer
 from motors_GPIO import *
 from mapping import *
+from junctions import *
+from tour import *
+from motionplan import *
 from ir_sensor import *
 from rfid import *
 from servo import *
+from line_follower import *
+from metrics import *
 
 class Movement(Thread):
     """
     Class holding majority of movement and motor controls, its main task is to interpret commands from speech queue.
 
-    :param queue: Queue between threads to which the speech engine adds commands
+    :param queue: CommandQueue between threads to which the speech engine adds commands, urgent commands in it preempt the current job
     :param pi: Instance of Raspberri Pi GPIO object used to write and read pins
     :param mapfile: A text file containing the imaginary map that the robot navigates
+    :param startdirect: Direction the robot faces on startup ("up", "down", "left" or "right")
     :param startcoords: Starting position of the robot on the given mapfile with the formula (y, x)
+    :param pid: Whether to follow the line with the PID controller of line_follower.py, False stops for bang-bang corrections instead
+    :param rolling: Whether to turn at junctions without stopping (see LineFollower.turn), requires pid
     """
-    def __init__(self, queue, pi, mapfile, startdirect, startcoords):
+    def __init__(self, queue, pi, mapfile, startdirect, startcoords, pid = True, rolling = True):
 
         # Multithreading
         super(Movement, self).__init__()
 
         self.pi = pi
-        self.map = Map(mapfile, startcoords)
+        self.map = Map(mapfile, startcoords, routecache = mapfile + ".routes") # Routes between stickers are cached next to the map file
+        self.map.watch() # Pick up edits to the map file without restarting
+        self.junctions = JunctionGraph(self.map) # Plans trips over RFID junctions instead of single tiles
+        self.tours = TourPlanner(self.map) # Orders multi-table deliveries
         self.queue = queue
         self.running = True
         self.direction = startdirect
+        self.home = self.map.is_sticker(startcoords) # Sticker to return to on "comeBack"
         self.motor1 = Motor(self.pi, 32, 40, 37) # Motor 1, requires 2 pins as input
         self.motor2 = Motor(self.pi, 12, 13, 15) # Motor 2, requires 2 pins as input
         self.motors = MotorController(self.pi, 36, [self.motor1, self.motor2])
         self.servo = ServoController(GPIO, 11)
         self.stepper = Stepper(self.pi, 8, 10, 35, 16) # Stepper motor, requires 4 pins as input
         self.motors.stop()
+
+        # Handlers of the commands coming from the speech queue, called with the argument of the command
+        self.handlers = {
+            "pillCount": self.dispense_pills,
+            "tableName": self.go_to_table,
+            "tour": self.deliver_tour,
+            "stop": self.halt,
+            "comeBack": self.come_back,
+        }
+        self.metrics = LatencyRecorder() # Time commands wait in the queue, time handlers take, time from command to motion and preemption latency
+        self.command_time = None # When the command being handled was issued
+
+        # Sensor threads live as long as the robot and are resumed only while following the line
+        self.irqueue = Queue()
+        self.rfidqueue = Queue()
+        self.ir = IRController(self.pi, self.irqueue, 29, 31, paused = True)
+        self.rfid = rfid_scanner(self.rfidqueue, self.map.waypoints, paused = True)
+        self.ir.start()
+        self.rfid.start()
+
+        # Steers continuously with the IR sensors while following the line, the IR thread then stays paused
+        self.follower = LineFollower(self.motors, self.ir.sensor1, self.ir.sensor2) if pid else None
+        self.rolling = rolling and self.follower is not None
         
     def run(self):
         """
         Called on startup of thread class, constantly runs in background.
+        Waits for commands on the queue and passes them to the handler registered for them in self.handlers.
         """
         while self.running:
 
-            if self.queue.empty():
+            # Block until a command arrives, waking up regularly to notice stop()
+            try:
+                data = self.queue.get(timeout = 0.5)
+            except Empty:
+                continue
+            received = timer()
+
+            # Get commands as list of two elements. First element is command itself, second element is argument to execute command with.
+            # A third element, if present, is the time (perf_counter) the command was put in the queue.
+            print(f"Got command {data[:2]}")
+            if len(data) > 2:
+                self.metrics.record("queue", received - data[2])
+            self.command_time = data[2] if len(data) > 2 else received
+
+            handler = self.handlers.get(data[0])
+            if handler is None:
+                print(f"Unknown command {data[0]}")
+            else:
+                handler(data[1])
+                self.metrics.record(f"handler {data[0]}", timer() - received)
+
+            self.command_time = None
+            self.queue.task_done() # Indicate that task has been processed
+
+    def dispense_pills(self, number):
+        """Stepper Pill Mechanism: turns out the requested amount of pills and raises the arm."""
+        # 528 is a full loop, 132 is 90 degrees of rotation = 1 pill
+        amount = 132 * self.number_of_pills(number)
+        self.stepper.clockwise(amount)
+        time.sleep(2)
+        print("Raising arm...")
+        self.servo.arm_up()
+        time.sleep(2)
+        self.servo.arm_down()
+        print("----------------------------------------")
+        print("DONE")
+        print("----------------------------------------")
+
+    def go_to_table(self, table):
+        """Move to Specific Table. Table is the letter of the table ranging from "a" to "d", or a waypoint name."""
+        if self.drive_to(table):
+            print("----------------------------------------")
+            print("DONE")
+            print("----------------------------------------")
 
-                sleep(0.1)
+        """
+        explored_stickers = set()
+        explored_stickers.add("e")
+        rfidqueue = Queue()
+        rfidthread = rfid_scanner(rfidqueue)
+        rfidthread.start()
+        irqueue = Queue()
+        irthread = IRController(self.pi, irqueue, 29, 31)
+        irthread.start()
+        self.motors.forward()
+        jaquan = True
+        first = True
+        while jaquan:
+            if rfidqueue.empty():
+                
+                if irqueue.empty():
+                    time.sleep(0.01)
+                
+                else:
+                    self.motors.stop()                            
+                    data = irqueue.get()    
+                
+                    # If have to move a bit left to correct reading
+                    if data == "l":
+                        
+                        # Stop motors, turn left
+                        self.motors.bit_left()
+                        
+                        # Stop thread
+                        print("Stopping thread")
+                        irthread.stop()
+                        irqueue.task_done()
+                        irthread.join()
+                        print("Stopped thread")
+                        
+                        # Start thread again
+                        irqueue = Queue()
+                        irthread = IRController(self.pi, irqueue, 29, 31)
+                        irthread.start()
+                        print("Started thread")
+                        self.motors.forward()
+                        time.sleep(0.2)
 
-            else:  
+                    # If have to move a bit right to correct reading
+                    elif data == "r":
+                        self.motors.bit_right()
+                        print("Stopping thread")
+                        irthread.stop()
+                        irqueue.task_done()
+                        irthread.join()
+                        print("Stopped thread")
+                        irqueue = Queue()
+                        irthread = IRController(self.pi, irqueue, 29, 31)
+                        irthread.start()
+                        print("Started thread")
+                        self.motors.forward()
+                        time.sleep(0.2)
+                        
+                    elif data == "b":
+                        
+                        # Stop motors, turn left
+                        self.motors.backward()
+                        time.sleep(1)
+                        self.motors.stop()
+                        
+                        # Stop thread
+                        print("Stopping thread")
+                        irthread.stop()
+                        irqueue.task_done()
+                        irthread.join()
+                        print("Stopped thread")
+                        
+                        # Start thread again
+                        irqueue = Queue()
+                        irthread = IRController(self.pi, irqueue, 29, 31)
+                        irthread.start()
+                        print("Started thread")
+                        self.motors.forward()
+                        time.sleep(0.2)
+            else:
+                data = rfidqueue.get()
+                print(data)
+                rfidqueue.task_done()
                 
-                # Get commands as list of two elements. First element is command itself, second element is argument to execute command with.
-                data = self.queue.get()
-                print(f"Got command {data}")
-
-                # Stepper Pill Mechanism
-                if data[0] == "pillCount":
-                    
-                    # 528 is a full loop, 132 is 90 degrees of rotation = 1 pill
-                    amount = 132 * self.number_of_pills(data[1])
-                    self.stepper.clockwise(amount)
-                    time.sleep(2)
-                    print("Raising arm...")
-                    self.servo.arm_up()
-                    time.sleep(2)
-                    self.servo.arm_down()
-                    print("----------------------------------------")
-                    print("DONE")
-                    print("----------------------------------------")
-
-                # Move to Specific Table
-                elif data[0] == "tableName":
-                    table = data[1] # Stores letter of table ranging from "a" to "d"
-                    path = self.map.find_path(table)
-                    print(path)
-                    self.move_on_path(path)
-                    print("----------------------------------------")
-                    print("DONE")
-                    print("----------------------------------------")
-
-                    """
-                    explored_stickers = set()
-                    explored_stickers.add("e")
-                    rfidqueue = Queue()
-                    rfidthread = rfid_scanner(rfidqueue)
-                    rfidthread.start()
+                if data not in explored_stickers:
+                    self.motors.stop()
+                    rfidthread.stop()
+                    rfidthread.join()
+                    irthread.stop()
+                    irthread.join()
+                    explored_stickers.add(data)
+                    if first:
+                        self.motors.turn_ccw()
+                        first = False
+                    else:
+                        self.motors.turn_cw()
                     irqueue = Queue()
                     irthread = IRController(self.pi, irqueue, 29, 31)
                     irthread.start()
                     self.motors.forward()
-                    jaquan = True
-                    first = True
-                    while jaquan:
-                        if rfidqueue.empty():
-                            
-                            if irqueue.empty():
-                                time.sleep(0.01)
-                            
-                            else:
-                                self.motors.stop()                            
-                                data = irqueue.get()    
-                            
-                                # If have to move a bit left to correct reading
-                                if data == "l":
-                                    
-                                    # Stop motors, turn left
-                                    self.motors.bit_left()
-                                    
-                                    # Stop thread
-                                    print("Stopping thread")
-                                    irthread.stop()
-                                    irqueue.task_done()
-                                    irthread.join()
-                                    print("Stopped thread")
-                                    
-                                    # Start thread again
-                                    irqueue = Queue()
-                                    irthread = IRController(self.pi, irqueue, 29, 31)
-                                    irthread.start()
-                                    print("Started thread")
-                                    self.motors.forward()
-                                    time.sleep(0.2)
-
-                                # If have to move a bit right to correct reading
-                                elif data == "r":
-                                    self.motors.bit_right()
-                                    print("Stopping thread")
-                                    irthread.stop()
-                                    irqueue.task_done()
-                                    irthread.join()
-                                    print("Stopped thread")
-                                    irqueue = Queue()
-                                    irthread = IRController(self.pi, irqueue, 29, 31)
-                                    irthread.start()
-                                    print("Started thread")
-                                    self.motors.forward()
-                                    time.sleep(0.2)
-                                    
-                                elif data == "b":
-                                    
-                                    # Stop motors, turn left
-                                    self.motors.backward()
-                                    time.sleep(1)
-                                    self.motors.stop()
-                                    
-                                    # Stop thread
-                                    print("Stopping thread")
-                                    irthread.stop()
-                                    irqueue.task_done()
-                                    irthread.join()
-                                    print("Stopped thread")
-                                    
-                                    # Start thread again
-                                    irqueue = Queue()
-                                    irthread = IRController(self.pi, irqueue, 29, 31)
-                                    irthread.start()
-                                    print("Started thread")
-                                    self.motors.forward()
-                                    time.sleep(0.2)
-                        else:
-                            data = rfidqueue.get()
-                            print(data)
-                            rfidqueue.task_done()
-                            
-                            if data not in explored_stickers:
-                                self.motors.stop()
-                                rfidthread.stop()
-                                rfidthread.join()
-                                irthread.stop()
-                                irthread.join()
-                                explored_stickers.add(data)
-                                if first:
-                                    self.motors.turn_ccw()
-                                    first = False
-                                else:
-                                    self.motors.turn_cw()
-                                irqueue = Queue()
-                                irthread = IRController(self.pi, irqueue, 29, 31)
-                                irthread.start()
-                                self.motors.forward()
-                                rfidqueue = Queue()
-                                rfidthread = rfid_scanner(rfidqueue)
-                                rfidthread.start()
-                            else:
-                                continue
-                        """
-                            
-                self.queue.task_done() # Indicate that task has been processed
+                    rfidqueue = Queue()
+                    rfidthread = rfid_scanner(rfidqueue)
+                    rfidthread.start()
+                else:
+                    continue
+            """
+
+    def deliver_tour(self, tables):
+        """Deliver to several tables in one job, tables being a list of table letters."""
+        if self.direction is None and not self.relocalise():
+            return
+        if self.map.current is None:
+            print("Current position is unknown, can't plan a tour")
+            return
+        plan = self.tours.plan(tables, self.direction)
+        if plan is None:
+            print(f"Can't reach all of the tables {tables}")
+            return
+        order, eta = plan
+        print(f"Tour order: {order}")
+        print(f"Predicted tour time: {eta:.1f} s")
+        for table in order:
+            if not self.running or not self.drive_to(table):
+                return
+        print("----------------------------------------")
+        print("DONE")
+        print("----------------------------------------")
+
+    def halt(self, argument):
+        """Stops where the robot is. The trip that was being driven has already been aborted by the preemption."""
+        self.motors.stop()
+        print("Stopped")
+
+    def come_back(self, argument):
+        """Drives back to the sticker the robot started on."""
+        if self.home is None:
+            print("The robot didn't start on a sticker, can't come back")
+            return
+        if self.direction is not None and self.map.current == self.map.get_coords_of_sticker(self.home):
+            print("Already back")
+            return
+        if self.drive_to(self.home):
+            print("Back at the start")
 
     def number_of_pills(self, number):
         """Converts commands from Speech-To-Intent engine to integrers."""
@@ -198,127 +280,244 @@ class Movement(Thread):
         elif number == "six":
             return 6
 
+    def drive_to(self, table):
+        """
+        Plans the fastest route from the current position to a table's sticker and drives it. Returns False if there is no route or the trip was preempted.
+        Planning holds the map lock, so the map watcher can't reload the map halfway through a plan.
+        """
+        if self.direction is None and not self.relocalise():
+            return False
+        with self.map.lock:
+            if self.map.current is None: # A reload removed the tile the robot was on
+                print("Current position is unknown, can't plan a route")
+                return False
+            if self.map.get_coords_of_sticker(table) is None:
+                print(f"There is no sticker {table} on the map")
+                return False
+            route = self.map.cached_route(table, self.direction)
+            if route is None: # Not standing on a sticker, plan from scratch
+                route = self.junctions.find_path(table, self.direction)
+        if route is None:
+            print(f"No route to table {table}")
+            return False
+
+        path, eta = route
+        print(path)
+        print(f"Predicted trip time: {eta:.1f} s")
+        return self.move_on_path(path)
+
     def stop(self):
         """Stops thread listening for commands."""
         self.running = False
+        self.map.stop_watching()
+        self.ir.stop()
+        self.rfid.stop()
+        self.ir.join()
+        self.rfid.join()
     
     def move_on_path(self, path):
-        """Executes each command in a list of elements to navigate on map."""
+        """
+        Drives along a path in the [coordinates, direction] format of Map.find_path.
+        The path is compiled into segments (see motionplan.compile_plan) that are executed one after another, a cursor keeping track of progress.
+        If a sticker that isn't on the path is read, the rest of the way is replanned from it with the distance field of the destination.
+        With rolling turns the robot keeps moving through stickers and turns onto the next segment while driving, only u-turns stop it.
+        The time every turn takes is recorded as "turn".
+        An urgent command in the queue aborts the trip at the next control tick, the time it took to stop is recorded as "preemption".
+        A trip aborted between two stickers leaves self.direction None, so the next trip relocalises first.
+        Returns True if the end of the path was reached, False if the trip was aborted.
+        """
+        goal = self.map.is_sticker(path[-1][0]) if path else None
+        plan = compile_plan(self.map, path, self.direction)
+        cursor = 0
+
+        # Repeat until the last segment was driven
+        while cursor < len(plan) and self.running and not self.queue.preempted():
+            segment = plan[cursor]
+            print(segment)
+
+            # Turn if the segment goes another way, then drive until its sticker, or for its predicted time if it ends without one
+            if self.command_time is not None:
+                self.metrics.record("command to motion", timer() - self.command_time)
+                self.command_time = None
+            turn = turn_between(self.direction, segment.direction)
+            if turn is not None:
+                began = timer()
+                if self.rolling and turn != "uturn":
+                    self.motors.forward()
+                    found = self.follower.turn(turn, abort = self.queue.preempted)
+                else:
+                    self.motors.stop()
+                    self.motors.turn(self.direction, segment.direction)
+                    found = True
+                self.metrics.record("turn", timer() - began)
+
+                if not found:
+                    # Stopped somewhere between the two branches, so the heading is unknown until the robot finds a line again
+                    self.motors.stop()
+                    self.direction = None
+                    if self.queue.preempted() or goal is None or not self.relocalise():
+                        break
+                    path = self.map.field_path(goal)
+                    if path is None:
+                        print(f"No route to sticker {goal} from sticker {self.map.is_sticker(self.map.current)}")
+                        return False
+                    plan = compile_plan(self.map, path, self.direction)
+                    cursor = 0
+                    continue
+                self.direction = segment.direction
+            self.motors.forward()
+            data = self.follow_line(None if segment.sticker is not None else segment.time, stop = not self.rolling)
+            if self.queue.preempted() and data is None:
+                # Stopped somewhere inside the segment, map.current is still the sticker it started from, so the position
+                # is unknown until the robot reaches a sticker again
+                self.direction = None
+                break
 
-        # Repeat until last destination left
-        while len(path) > 1 and self.running:
+            if data is None:
+                if segment.sticker is None: # Drove for the time of a segment without sticker
+                    self.map.set_current_coords(segment.end)
+                    cursor += 1
+                continue
+
+            # Read letter of sticker encountered and get coordinates of it
+            print(data)
+            readsticker = self.map.get_coords_of_sticker(data)
+            if readsticker == self.map.current: # Still on the sticker the segment started from
+                continue
+
+            # Find the segment ending at the sticker, looking ahead from the cursor, and continue after it
+            index = None
+            for i in range(cursor, len(plan)):
+                if plan[i].end == readsticker:
+                    index = i
+                    break
+
+            if index is not None:
+                self.map.set_current_coords(readsticker)
+                cursor = index + 1
+            elif readsticker is not None and goal is not None:
+                # Drifted off the path, continue from the sticker that was read
+                print(f"Sticker {data} is not on the path, replanning")
+                self.map.set_current_coords(readsticker)
+                path = self.map.field_path(goal)
+                if path is None:
+                    print(f"No route to sticker {goal} from sticker {data}")
+                    self.motors.stop()
+                    return False
+                plan = compile_plan(self.map, path, self.direction)
+                cursor = 0
+
+        self.motors.stop()
+        if self.queue.preempted():
+            print("Trip preempted")
+            self.metrics.record("preemption", timer() - self.queue.preempt_time)
+            return False
+        return cursor >= len(plan)
+
+    def relocalise(self):
+        """
+        Finds out where the robot is and which way it faces after a rolling turn or a trip was cut short, leaving self.direction None.
+        Turns until the line sensors see a line (unless they already do), follows it to the next sticker, and takes the heading
+        from the last move of the shortest path between the sticker the robot was on and that one. Returns False if that failed.
+        """
+        start = self.map.current
+        if self.follower is None or start is None:
+            print("Can't find the heading of the robot")
+            return False
+        print("Heading unknown, following the line to the next sticker")
 
-            # Unpack commands, set current coords
-            current = path[0]
-            path = path[1:]
-            coords, direct = current
+        self.motors.forward()
+        if self.follower.error() is None and not self.follower.turn("cw", abort = self.queue.preempted):
+            self.motors.stop()
+            print("Couldn't find the line")
+            return False
+
+        # The sticker the robot stands on may be read again before the next one
+        data = self.follow_line()
+        while data is not None and self.map.get_coords_of_sticker(data) == start:
+            self.motors.forward()
+            data = self.follow_line()
+        coords = None if data is None else self.map.get_coords_of_sticker(data)
+        if coords is None:
+            return False
+
+        with self.map.lock:
+            path = self.map.find_path(data)
+            if not path:
+                return False
             self.map.set_current_coords(coords)
-            print(current)
+        self.direction = path[-1][1]
+        print(f"At sticker {data} heading {self.direction}")
+        return True
+
+    def follow_line(self, duration = None, stop = True):
+        """
+        Drives forward along the line, correcting with the IR sensors, until an RFID sticker is read or duration seconds passed.
+        Returns the name of the sticker read, or None if the time ran out or an urgent command came in. Motors are stopped when it returns, unless stop is False.
+        With the PID follower the duty cycles are adjusted every tick without stopping, and only a lost line is corrected by backing up.
+        The sensor threads are only paused and resumed, and the time every correction takes is recorded as "correction".
+        """
+        deadline = None if duration is None else time.time() + duration
+        self.rfid.waypoints = self.map.waypoints # The map may have been reloaded
+        if self.follower is None:
+            self.ir.resume()
+        else:
+            self.follower.start()
+        self.rfid.resume()
 
-            # Initialize queue for communication with IR and RFID Thread
-            irqueue = Queue()
-            rfidqueue = Queue()
-            
-            # If no orientation change required
-            if self.direction == direct:
-                self.motors.forward()
+        # Repeat until you are at an RFID junction
+        while self.rfidqueue.empty() and self.running and not self.queue.preempted() and (deadline is None or time.time() < deadline):
 
-            # If you have to turn for next command
+            if self.follower is not None:
+                if self.follower.step():
+                    sleep(self.follower.interval)
+                    continue
+                data = "b" # Both sensors lost the line
             else:
-                self.motors.turn(self.direction, direct)
-                self.direction == direct
-                self.motors.forward()
-
-            # Start threads
-            irthread = IRController(self.pi, irqueue, 29, 31)
-            rfidthread = rfid_scanner(rfidqueue)
-            irthread.start()
-            rfidthread.start()
-
-            # Repeat until you are at an RFID junction
-            junction = False
-            while junction == False:
-
-                if rfidqueue.empty():
-                    
-                    if irqueue.empty():
-                        time.sleep(0.01)
-                    
-                    else:
-                        self.motors.stop()                            
-                        data = irqueue.get()    
-                    
-                        # If have to move a bit left to correct reading
-                        if data == "l":
-                            
-                            # Stop motors, turn left
-                            self.motors.bit_left()
-                            
-                            # Stop thread
-                            irthread.stop()
-                            irqueue.task_done()
-                            irthread.join()
-                            
-                            # Start thread again
-                            irqueue = Queue()
-                            irthread = IRController(self.pi, irqueue, 29, 31)
-                            irthread.start()
-                            self.motors.forward()
-                            time.sleep(0.1)
-
-                        # If have to move a bit right to correct reading
-                        elif data == "r":
-                            self.motors.bit_right()
-
-                            irthread.stop()
-                            irqueue.task_done()
-                            irthread.join()
-
-                            irqueue = Queue()
-                            irthread = IRController(self.pi, irqueue, 29, 31)
-                            irthread.start()
-
-                            self.motors.forward()
-                            time.sleep(0.1)
-                            
-                        elif data == "b":
-                            
-                            self.motors.backward()
-                            time.sleep(0.75)
-                            self.motors.stop()
-                            
-                            irthread.stop()
-                            irqueue.task_done()
-                            irthread.join()
-                            
-                            irqueue = Queue()
-                            irthread = IRController(self.pi, irqueue, 29, 31)
-                            irthread.start()
-
-                            self.motors.forward()
-                            time.sleep(0.1)
+                try:
+                    data = self.irqueue.get(timeout = 0.01)
+                except Empty:
+                    continue
+                self.irqueue.task_done()
+            began = timer()
 
-                else:
+            # Stop motors and sensing while correcting, so readings taken during the correction are dropped
+            self.ir.pause()
+            self.motors.stop()
+            if self.follower is not None:
+                self.follower.stop()
 
-                    # Stop motors and threads, reset IRQueue
-                    self.motors.stop()
-                    rfidthread.stop()
-                    irthread.stop()
-                    rfidthread.join()
-                    irthread.join()
+            # If have to move a bit left to correct reading
+            if data == "l":
+                self.motors.bit_left()
+
+            # If have to move a bit right to correct reading
+            elif data == "r":
+                self.motors.bit_right()
+
+            elif data == "b":
+                self.motors.backward()
+                time.sleep(0.75)
+                self.motors.stop()
+
+            self.motors.forward()
+            if self.follower is None:
+                self.ir.resume()
+            else:
+                self.follower.start()
+            self.metrics.record("correction", timer() - began)
+
+        # Stop motors and sensing
+        if stop:
+            self.motors.stop()
+        if self.follower is not None:
+            self.follower.stop()
+        self.ir.pause()
+        self.rfid.pause()
 
-                    # Read letter of sticker encountered and get coordinates of it
-                    data = rfidqueue.get()
-                    print(data)
-                    readsticker = self.map.get_coords_of_sticker(data)
-
-                    # Find coordinate in list of commands and set current coords to it
-                    for i in range(len(path)):
-                        if path[i][0] == readsticker:
-                            self.map.set_current_coords(readsticker)
-                            index = i
-                            break
-                    
-                    path = path[(index + 1):]
-                    rfidqueue.task_done()
-                    junction = True
\ No newline at end of file
+        try:
+            data = self.rfidqueue.get_nowait()
+        except Empty:
+            return None
+        self.rfidqueue.task_done()
+        return data
@@ -0,0 +1,225 @@
+# Cooperative planning for several robots driving on the same map
+# Robots are planned one after another (prioritized planning). Every robot's plan is searched with space-time A*
+# over (tile, time step) states and avoids the tiles and moves reserved by the robots planned before it.
+#
+# Benchmark on synthetic maps: python multirobot.py [--kinds grid maze warehouse] [--size 100] [--robots 2 5 10 20]
+
+import argparse
+import heapq
+import os
+import tempfile
+from collections import deque
+from time import perf_counter as timer
+import numpy as np
+import mapgen
+from mapping import Map, MASK_MOVES, UNREACHABLE
+
+class ReservationTable():
+    """
+    Tiles and moves claimed by planned robots, per time step.
+    A robot that reached its goal parks there, claiming the tile for every later time step.
+    """
+    def __init__(self):
+
+        self.tiles = {} # (flat tile index, time) -> robot
+        self.moves = set() # (from tile, to tile, departure time) of every planned move
+        self.parked = {} # Flat tile index -> time from which a robot is parked on it
+        self.last = {} # Flat tile index -> last time it is reserved by a moving robot
+
+    def is_free(self, tile, time):
+        """Returns True if no robot is on a tile at a time step."""
+        if (tile, time) in self.tiles:
+            return False
+        parked = self.parked.get(tile)
+        return parked is None or time < parked
+
+    def can_park(self, tile, time):
+        """Returns True if a robot arriving at a tile at a time step can stay there, since no other robot needs it later."""
+        return self.last.get(tile, -1) < time and tile not in self.parked
+
+    def reserve(self, robot, plan):
+        """Reserves a plan (list of flat tile indexes per time step) of a robot, which parks on the last tile of it."""
+        for time, tile in enumerate(plan):
+            self.tiles[(tile, time)] = robot
+            self.last[tile] = max(self.last.get(tile, -1), time)
+            if time > 0 and plan[time - 1] != tile:
+                self.moves.add((plan[time - 1], tile, time - 1))
+        self.parked[plan[-1]] = len(plan) - 1
+
+class MultiRobotPlanner():
+    """
+    Plans collision-free, time-indexed routes for several robots on one map.
+    Time is counted in steps, driving onto a tile takes as many steps as its cost class and waiting on a tile takes one step.
+    Two robots are never on the same tile at the same time step and never swap tiles between two time steps.
+    Robots are planned in the given order, each one around the reservations of the robots before it, using the distance field
+    of its goal as an exact heuristic, so a robot is only delayed by the robots ahead of it in the order.
+
+    :param map: Map to plan on, queried through a snapshot so planning isn't disturbed by changes to the map
+    :param slack: Extra time steps a robot may spend waiting or detouring, on top of twice its shortest trip
+    """
+    def __init__(self, map, slack = 64):
+
+        self.map = map
+        self.slack = slack
+
+    def plan(self, robots):
+        """
+        Plans a list of robots, given as (start coordinates (y, x), goal sticker) pairs.
+        Returns a list with a plan per robot: the coordinates of the robot at every time step until it reaches its goal,
+        or None if no plan was found within the time limit (the robot is then left standing at its start).
+        """
+        map = self.map.snapshot()
+        width = map.width
+        table = ReservationTable()
+
+        # Robots that aren't planned yet are treated as parked on their start tiles, so a robot that can't be planned
+        # and stays where it is can't be run into
+        starts = [start[0] * width + start[1] for start, _ in robots]
+        if len(set(starts)) != len(starts):
+            raise Exception("Two robots can't start on the same tile")
+        for start in starts:
+            table.parked[start] = 0
+
+        plans = []
+        for robot, (start, sticker) in enumerate(robots):
+            field = memoryview(map.distance_field(sticker))
+            del table.parked[starts[robot]]
+            plan = self._search(map, starts[robot], field, table)
+            if plan is None:
+                plan = [starts[robot]] # Stays at its start for good
+                plans.append(None)
+            else:
+                plans.append([divmod(tile, width) for tile in plan])
+            table.reserve(robot, plan)
+        return plans
+
+    def _search(self, map, start, field, table):
+        """
+        Space-time A* from flat tile index start to the tile where field is 0, avoiding reservations.
+        Returns the plan as a list of flat tile indexes per time step, or None if the goal isn't reachable within the time limit.
+        """
+        if field[start] == UNREACHABLE:
+            return None
+        masks = map.flatmasks
+        costs = map.flatgrid
+        offsets = map.offsets
+        horizon = 2 * field[start] + self.slack
+
+        # Robots parked for good can't be passed on a line, give up right away if they cut the robot off from its goal
+        walls = {tile for tile, time in table.parked.items() if time == 0}
+        if walls:
+            seen = {start}
+            queue = deque((start,))
+            while queue:
+                tile = queue.popleft()
+                if field[tile] == 0:
+                    break
+                for move in MASK_MOVES[masks[tile]]:
+                    neighbor = tile + offsets[move]
+                    if neighbor not in seen and neighbor not in walls:
+                        seen.add(neighbor)
+                        queue.append(neighbor)
+            else:
+                return None
+
+        # States are (tile, time), the time being the cost so far. The parent of a state is the state it was entered from.
+        parent = {(start, 0): None}
+        heap = [(field[start], 0, start)]
+        while heap:
+            _, time, tile = heapq.heappop(heap)
+            if field[tile] == 0 and table.can_park(tile, time):
+                plan = []
+                state = (tile, time)
+                while state is not None:
+                    previous = parent[state]
+                    steps = state[1] - (previous[1] if previous is not None else -1)
+                    plan.extend([state[0]] * steps) # The robot is on the tile it drives onto for the whole move
+                    state = previous
+                plan.reverse()
+                return plan
+            if time >= horizon:
+                continue
+
+            # Wait a step
+            if table.is_free(tile, time + 1) and (tile, time + 1) not in parent:
+                parent[(tile, time + 1)] = (tile, time)
+                heapq.heappush(heap, (time + 1 + field[tile], time + 1, tile))
+
+            # Drive onto a neighbor, unless a robot comes the other way or is on the neighbor during the move
+            for move in MASK_MOVES[masks[tile]]:
+                neighbor = tile + offsets[move]
+                arrival = time + costs[neighbor]
+                if (neighbor, arrival) in parent or (neighbor, tile, time) in table.moves:
+                    continue
+                if all(table.is_free(neighbor, step) for step in range(time + 1, arrival + 1)):
+                    parent[(neighbor, arrival)] = (tile, time)
+                    heapq.heappush(heap, (arrival + field[neighbor], arrival, neighbor))
+
+        return None
+
+def find_conflicts(plans):
+    """
+    Checks plans made by MultiRobotPlanner for collisions, robots staying on their last tile after their plan ends.
+    Returns a list of (time, robot, other robot) for every time two robots share a tile or swap tiles.
+    """
+    plans = [plan for plan in plans if plan is not None]
+    if not plans:
+        return []
+    length = max(len(plan) for plan in plans)
+    conflicts = []
+    for time in range(length):
+        at = {}
+        for robot, plan in enumerate(plans):
+            tile = plan[min(time, len(plan) - 1)]
+            if tile in at:
+                conflicts.append((time, at[tile], robot))
+            at[tile] = robot
+            if 0 < time < len(plan):
+                other = at.get(plan[time - 1])
+                if other is not None and other != robot and plans[other][min(time - 1, len(plans[other]) - 1)] == tile:
+                    conflicts.append((time, other, robot))
+    return conflicts
+
+def benchmark(kinds = mapgen.KINDS, size = 100, counts = (2, 5, 10, 20), seed = 0):
+    """Plans growing groups of robots on synthetic maps and prints planning time, how many robots got a plan, and the plan lengths."""
+    rng = np.random.default_rng(seed)
+    for kind in kinds:
+        grid, stickers = mapgen.generate(kind, size, size, max(counts), seed)
+        with tempfile.NamedTemporaryFile("w", suffix = ".txt", delete = False) as file:
+            pass
+        try:
+            mapgen.write_map(grid, stickers, file.name)
+            map = Map(file.name, None, field_cache = max(counts))
+        finally:
+            os.remove(file.name)
+
+        # Robots start on random line tiles that have no sticker, and every robot drives to a different sticker
+        free = np.flatnonzero(grid.reshape(-1))
+        free = [tile for tile in free.tolist() if divmod(tile, size) not in map.sticker_at]
+        planner = MultiRobotPlanner(map)
+        for count in counts:
+            if count > len(stickers):
+                continue
+            starts = [divmod(tile, size) for tile in rng.choice(free, count, replace = False).tolist()]
+            robots = list(zip(starts, sorted(stickers)[:count]))
+            begin = timer()
+            plans = planner.plan(robots)
+            elapsed = timer() - begin
+
+            planned = [plan for plan in plans if plan is not None]
+            makespan = max((len(plan) - 1 for plan in planned), default = 0)
+            total = sum(len(plan) - 1 for plan in planned)
+            print(f"{kind:>10} {size:>5} {count:>3} robots: {elapsed * 1000:8.1f} ms, {len(planned)}/{count} planned, "
+                  f"makespan {makespan}, total {total} steps, {len(find_conflicts(plans))} conflicts")
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark multi-robot planning on synthetic maps")
+    parser.add_argument("--kinds", nargs = "+", default = list(mapgen.KINDS), choices = mapgen.KINDS)
+    parser.add_argument("--size", type = int, default = 100, help = "Side length of the square maps")
+    parser.add_argument("--robots", nargs = "+", type = int, default = [2, 5, 10, 20], help = "Group sizes to plan (at most 26)")
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args()
+    benchmark(args.kinds, args.size, args.robots, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import heapq
+import os
+import tempfile
+from time import perf_counter as timer
+from mapping import Map, MOVES, MASK_MOVES
+
+class IncrementalPlanner():
+    """
+    D* Lite planner that keeps a shortest path from the robot to one sticker up to date while tiles of the map get blocked and unblocked.
+    The search runs backwards from the goal, so after a change only the part of the search tree affected by it is repaired,
+    instead of searching the whole map again. Driving onto a tile costs its cost class (1 for "#" tiles), so slow tiles are avoided
+    like in Map.find_fastest_path, but turns are free.
+
+    :param map: Map object to plan on. The planner registers itself to be told about blocked and unblocked tiles, call close() to stop that.
+    :param sticker: Letter of the destination sticker
+    """
+    def __init__(self, map, sticker):
+
+        self.map = map
+        self.sticker = sticker
+        if map.get_coords_of_sticker(sticker) is None:
+            raise Exception(f"'{sticker}' is not a valid sticker")
+        self.reset()
+        map.listeners.append(self.tile_changed)
+
+    def reset(self):
+        """
+        Starts the search over from the goal. Called when the map was reloaded with another size or moved stickers,
+        which makes the stored tile indexes meaningless. If the goal sticker is gone, plan() returns None until it's back.
+        """
+        map = self.map
+        width = map.width
+        self.width = width
+        self.offsets = map.offsets
+        goal = map.get_coords_of_sticker(self.sticker)
+        self.goal = None if goal is None else goal[0] * width + goal[1]
+
+        # Until the current coordinates are known, the search starts as if the robot stood on the goal
+        current = map.current
+        self.start = self.goal if current is None or goal is None else current[0] * width + current[1]
+        self.last = self.start
+        self.km = 0 # Key modifier, grows as the robot moves so old queue keys stay valid lower bounds
+
+        # Cost-to-goal estimates: g is the value from the last expansion, rhs the one-step lookahead. Missing entries are infinite.
+        self.g = {}
+        self.rhs = {} if self.goal is None else {self.goal: 0}
+
+        # Priority queue with lazy deletion: self.open holds the current key of every queued tile, heap entries with another key are stale
+        self.open = {}
+        self.heap = []
+        if self.goal is not None:
+            self._push(self.goal)
+
+    def close(self):
+        """Stops listening to changes of the map."""
+        if self.tile_changed in self.map.listeners:
+            self.map.listeners.remove(self.tile_changed)
+
+    def _heuristic(self, a, b):
+        """Manhattan distance between two flat tile indexes, never larger than the real path cost since every tile costs at least 1."""
+        ay, ax = divmod(a, self.width)
+        by, bx = divmod(b, self.width)
+        return abs(ay - by) + abs(ax - bx)
+
+    def _key(self, index):
+        """Priority of a tile in the queue."""
+        value = min(self.g.get(index, float("inf")), self.rhs.get(index, float("inf")))
+        return (value + self._heuristic(self.start, index) + self.km, value)
+
+    def _push(self, index):
+        """Puts a tile in the queue, replacing any earlier entry of it."""
+        key = self._key(index)
+        self.open[index] = key
+        heapq.heappush(self.heap, (key, index))
+
+    def _top(self):
+        """Returns the smallest valid (key, index) entry of the queue without removing it, dropping stale entries on the way."""
+        while self.heap:
+            key, index = self.heap[0]
+            if self.open.get(index) == key:
+                return key, index
+            heapq.heappop(self.heap)
+        return (float("inf"), float("inf")), None
+
+    def _update(self, index):
+        """Recomputes the lookahead value of a tile from its neighbors and (re)queues it if it became inconsistent."""
+        inf = float("inf")
+        if index != self.goal:
+            best = inf
+            costs = self.map.flatgrid
+            for move in MASK_MOVES[self.map.flatmasks[index]]:
+                neighbor = index + self.offsets[move]
+                value = self.g.get(neighbor, inf) + costs[neighbor]
+                if value < best:
+                    best = value
+            self.rhs[index] = best
+        self.open.pop(index, None)
+        if self.g.get(index, inf) != self.rhs.get(index, inf):
+            self._push(index)
+
+    def _compute(self):
+        """Expands tiles until the path from the start tile is known to be the shortest one."""
+        inf = float("inf")
+        g = self.g
+        rhs = self.rhs
+        masks = self.map.flatmasks
+        offsets = self.offsets
+        while True:
+            key, index = self._top()
+            if index is None or (key >= self._key(self.start) and rhs.get(self.start, inf) == g.get(self.start, inf)):
+                return
+
+            new_key = self._key(index)
+            if key < new_key:
+                self._push(index)
+            elif g.get(index, inf) > rhs.get(index, inf):
+                g[index] = rhs[index]
+                del self.open[index]
+                for move in MASK_MOVES[masks[index]]:
+                    self._update(index + offsets[move])
+            else:
+                g.pop(index, None)
+                del self.open[index]
+                self._update(index)
+                for move in MASK_MOVES[masks[index]]:
+                    self._update(index + offsets[move])
+
+    def tile_changed(self, coords):
+        """
+        Called by the map when a tile gets blocked or unblocked. Marks the tile and its neighbors for repair on the next plan().
+        Coords is None after a reload that resized the map or moved stickers, then the search starts over.
+        """
+        if coords is None:
+            self.reset()
+            return
+        if self.goal is None:
+            return
+        y, x = coords
+        index = y * self.width + x
+        self._update(index)
+        for dy, dx, _ in MOVES:
+            if 0 <= y + dy < self.map.height and 0 <= x + dx < self.map.width:
+                self._update(index + dy * self.width + dx)
+
+    def plan(self):
+        """
+        Returns the shortest path from the current coordinates of the map to the goal sticker,
+        in the [coordinates, direction] format of Map.find_path, or None if the goal can't be reached.
+        """
+        inf = float("inf")
+        if self.goal is None:
+            return None
+        if self.map.current is None:
+            raise Exception("The current coordinates of the map aren't known")
+        current = self.map.current[0] * self.width + self.map.current[1]
+        if current != self.start:
+            self.km += self._heuristic(self.last, current)
+            self.last = current
+            self.start = current
+        self._compute()
+
+        if self.g.get(self.start, inf) == inf:
+            return None
+
+        # Follow the neighbor with the lowest cost of driving onto it plus its cost-to-goal from the start to the goal
+        masks = self.map.flatmasks
+        costs = self.map.flatgrid
+        path = []
+        index = self.start
+        while index != self.goal:
+            best = None
+            for move in MASK_MOVES[masks[index]]:
+                neighbor = index + self.offsets[move]
+                value = self.g.get(neighbor, inf) + costs[neighbor]
+                if best is None or value < best[0]:
+                    best = (value, move)
+            index += self.offsets[best[1]]
+            path.append([divmod(index, self.width), MOVES[best[1]][2]])
+        return path
+
+def corridor_map(size, spacing = 4):
+    """Returns the text of a square warehouse-like map of corridors every spacing tiles, with sticker "z" in the far corner."""
+    rows = []
+    for y in range(size):
+        if y % spacing == 0:
+            rows.append("#" * size)
+        else:
+            rows.append("".join("#" if x % spacing == 0 else "-" for x in range(size)))
+    last = (size - 1) // spacing * spacing
+    rows[last] = rows[last][:last] + "z" + rows[last][last + 1:]
+    return "\n".join(rows)
+
+def benchmark(sizes = (100, 300, 1000), blocks = 10):
+    """
+    Compares repairing a plan with IncrementalPlanner against planning again from scratch with Map.find_path.
+    For every map size, an obstacle is put a few steps ahead of the robot on the current plan, the plan is repaired, and the robot moves on.
+    """
+    for size in sizes:
+        with tempfile.NamedTemporaryFile("w", suffix = ".txt", delete = False) as file:
+            file.write(corridor_map(size))
+        try:
+            map = Map(file.name, (0, 0))
+        finally:
+            os.remove(file.name)
+
+        start = timer()
+        planner = IncrementalPlanner(map, "z")
+        path = planner.plan()
+        initial = timer() - start
+
+        repair = 0.0
+        full = 0.0
+        count = 0
+        obstacle = None
+        for _ in range(blocks):
+            if path is None or len(path) < 8:
+                break
+            count += 1
+
+            # Move the obstacle to a tile a few steps ahead of the robot
+            if obstacle is not None:
+                map.unblock_tile(obstacle)
+            obstacle = path[5][0]
+            map.block_tile(obstacle)
+
+            start = timer()
+            path = planner.plan()
+            repair += timer() - start
+
+            start = timer()
+            map.find_path("z")
+            full += timer() - start
+
+            # Drive a few tiles along the new plan
+            if path is not None:
+                map.set_current_coords(path[2][0])
+                path = path[3:]
+
+        planner.close()
+        count = max(count, 1)
+        print(f"{size}x{size}: initial plan {initial * 1000:.1f} ms, repair {repair / count * 1000:.2f} ms, full replan {full / count * 1000:.2f} ms (average of {count})")
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,20 +1,32 @@
 import mfrc522
 from time import sleep
 import RPi.GPIO as GPIO
-from threading import Thread
+from sensorworker import SensorWorker
 
-class rfid_scanner(Thread):
+# Stickers of the original floor, recognized by the 3rd byte of their UID
+STICKER_UIDS = {241: "a", 237: "b", 232: "c", 228: "d", 224: "e", 220: "f", 216: "g", 212: "h", 208: "i", 204: "j"}
 
-    def __init__ (self, queue):
+class rfid_scanner(SensorWorker):
+    """
+    Thread reading RFID stickers and putting the name of every sticker read in a queue.
+    The reader is only set up once, pause and resume the thread (see SensorWorker) instead of making a new one.
 
-        super(rfid_scanner, self).__init__()
-        self.queue = queue
-        self.running = True
+    :param queue: Queue to put sticker letters or waypoint names in
+    :param waypoints: WaypointRegistry used to look up sticker UIDs, stickers missing from it are looked up in STICKER_UIDS
+    :param paused: Whether the thread starts paused
+    """
+    def __init__ (self, queue, waypoints = None, paused = False):
+
+        super(rfid_scanner, self).__init__(queue, paused)
+        self.waypoints = waypoints
         self.reader = mfrc522.MFRC522()
 
     def run(self):
         
         while self.running:
+
+            if not self.wait_active():
+                continue
                         
             # Scan for cards
             (status,TagType) = self.reader.MFRC522_Request(self.reader.PICC_REQIDL)
@@ -28,37 +40,19 @@ class rfid_scanner(Thread):
                 # Print UID
                 #print("UID: "+str(uid[0])+","+str(uid[1])+","+str(uid[2])+","+str(uid[3]))
 
-                # Put letter of sticker in queue by comparing 3rd number of UID with database
-                self.queue.put(self.uid_to_sticker(uid[2]))
-                print(f"UID: {self.uid_to_sticker(uid[2])}")
+                # Put name of sticker in queue by looking up its UID
+                sticker = self.uid_to_sticker(uid)
+                self.report(sticker)
+                print(f"UID: {sticker}")
                 sleep(1)
     
-    def uid_to_sticker(self, data):
-        if data == 241:
-            return "a"
-        elif data == 237:
-            return "b"
-        elif data == 232:
-            return "c"
-        elif data == 228:
-            return "d"
-        elif data == 224:
-            return "e"
-        elif data == 220:
-            return "f"
-        elif data == 216:
-            return "g"
-        elif data == 212:
-            return "h"
-        elif data == 208:
-            return "i"
-        elif data == 204:
-            return "j"
-        else:
-            return None
-    
-    def stop(self):
-        self.running = False
+    def uid_to_sticker(self, uid):
+        """Returns the waypoint name or sticker letter of a sticker from its UID bytes, None if the sticker is unknown."""
+        if self.waypoints is not None:
+            name = self.waypoints.name_of_uid(uid)
+            if name is not None:
+                return name
+        return STICKER_UIDS.get(uid[2])
 """       
 #TESTING CODE
 GPIO.setwarnings(False)
@@ -0,0 +1,52 @@
+from queue import Empty
+from threading import Thread, Event
+
+class SensorWorker(Thread):
+    """
+    Base class of sensor threads that live as long as the program and report readings through a queue.
+    Instead of being stopped and started again, a worker is paused while its readings aren't needed and resumed afterwards,
+    which drops readings taken in the meantime. Subclasses implement run() and call wait_active() before every reading.
+
+    :param queue: Queue to put readings in
+    :param paused: Whether the worker starts paused
+    """
+    def __init__(self, queue, paused = False):
+
+        super(SensorWorker, self).__init__(daemon = True)
+        self.queue = queue
+        self.running = True
+        self.active = Event() # Set while readings are wanted
+        if not paused:
+            self.active.set()
+
+    def wait_active(self, timeout = 0.1):
+        """Blocks while the worker is paused, at most timeout seconds. Returns True if readings are wanted."""
+        return self.active.wait(timeout) and self.running
+
+    def report(self, reading):
+        """Puts a reading in the queue, unless the worker was paused while taking it."""
+        if self.active.is_set():
+            self.queue.put(reading)
+
+    def pause(self):
+        """Stops taking readings until resume() is called."""
+        self.active.clear()
+
+    def resume(self):
+        """Drops readings still in the queue and takes readings again."""
+        self.flush()
+        self.active.set()
+
+    def flush(self):
+        """Drops every reading in the queue."""
+        while True:
+            try:
+                self.queue.get_nowait()
+            except Empty:
+                return
+            self.queue.task_done()
+
+    def stop(self):
+        """Ends the thread."""
+        self.running = False
+        self.active.set()
@@ -324,7 +324,7 @@ class Recognizer(Thread):
             print("Understood intent: {}".format(intent.intent))
             for slot, value in intent.slots.items():
                 print("    {} : {}".format(slot, value))
-                command = [slot, value]
+                command = [slot, value, timer()] # Time of issuing, so the time commands wait in the queue can be measured
                 self.queue.put(command)
 
         else:
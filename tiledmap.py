@@ -0,0 +1,266 @@
+# Tiled, memory-mapped storage for maps too large to keep in memory (multi-floor or campus-scale deployments)
+# The grid and neighbor masks are cut into fixed-size square tiles, each compressed on its own in a .tiles file.
+# Tiles are only decompressed when the search touches them, and a limited amount of decoded tiles is kept in an LRU cache.
+#
+# Convert a text map: python tiledmap.py <map file> <output .tiles file> [--tile-size N]
+
+import argparse
+import hashlib
+import mmap
+import struct
+import zlib
+from collections import OrderedDict
+import numpy as np
+from mapping import Map, neighbor_masks, tile_costs
+
+# File layout: header, compressed tiles, tile index of (offset, length) records, sticker records of (name length, name, y, x).
+# Every decompressed tile holds tile_size * tile_size grid bytes followed by as many neighbor mask bytes. All numbers are little-endian.
+# Header: magic, version, height, width, tile size, sticker count, offset of the tile index, SHA-1 of the source text map
+TILED_MAGIC = b"RTIL"
+TILED_VERSION = 1
+TILED_HEADER = struct.Struct("<4sHIIHIQ20s")
+TILED_INDEX = struct.Struct("<QI")
+TILED_STICKER = struct.Struct("<II")
+
+def read_bands(mapfile, band, width, digest):
+    """
+    Yields the text map file as consecutive (grid rows, sticker positions) bands of band rows each, updating digest with the raw bytes.
+    Only one band is held in memory at a time.
+    """
+    rows = []
+    y = 0
+    stickers = []
+    with open(mapfile, "rb") as file:
+        for line in file:
+            digest.update(line)
+            chars = np.frombuffer(line.rstrip(b"\r\n").ljust(width, b"-"), dtype = np.uint8)
+            grid, letters = tile_costs(chars)
+            rows.append(grid)
+            for x in np.flatnonzero(letters):
+                stickers.append((chr(chars[x]), (y, int(x))))
+            y += 1
+            if len(rows) == band:
+                yield np.array(rows), stickers
+                rows = []
+                stickers = []
+    if rows:
+        yield np.array(rows), stickers
+
+def write_tiled(mapfile, outfile, tile_size = 64):
+    """
+    Converts a text map file to a tiled map file, streaming it band by band so the whole map never has to fit in memory.
+    Returns the amount of tiles written.
+    """
+    # First pass: size of the map
+    height = 0
+    width = 0
+    with open(mapfile, "rb") as file:
+        for line in file:
+            height += 1
+            width = max(width, len(line.rstrip(b"\r\n")))
+    tiles_y = (height + tile_size - 1) // tile_size
+    tiles_x = (width + tile_size - 1) // tile_size
+
+    # Second pass: compute masks one band of tiles at a time, with one row of the bands above and below to see across band edges
+    digest = hashlib.sha1()
+    stickers = {}
+    index = []
+    with open(outfile, "wb") as out:
+        out.write(b"\0" * TILED_HEADER.size)
+        offset = TILED_HEADER.size
+        above = np.zeros((1, width), dtype = np.uint8)
+        bands = read_bands(mapfile, tile_size, width, digest)
+        current = next(bands, None)
+        while current is not None:
+            following = next(bands, None)
+            grid, found = current
+            for name, coords in found:
+                if name in stickers:
+                    raise Exception(f"Sticker '{name}' appears more than once in {mapfile}: at {stickers[name]} and {coords}")
+                stickers[name] = coords
+
+            below = following[0][:1] if following is not None else np.zeros((1, width), dtype = np.uint8)
+            masks = neighbor_masks(np.vstack((above, grid, below)))[1:-1]
+            above = grid[-1:]
+
+            # Pad the band to full tiles and write every tile in it
+            padded = np.zeros((2, tile_size, tiles_x * tile_size), dtype = np.uint8)
+            padded[0, :grid.shape[0], :width] = grid
+            padded[1, :grid.shape[0], :width] = masks
+            for tx in range(tiles_x):
+                blob = zlib.compress(np.ascontiguousarray(padded[:, :, tx * tile_size:(tx + 1) * tile_size]).tobytes(), 1)
+                out.write(blob)
+                index.append(TILED_INDEX.pack(offset, len(blob)))
+                offset += len(blob)
+            current = following
+
+        out.write(b"".join(index))
+        for name, (y, x) in stickers.items():
+            encoded = name.encode()
+            out.write(bytes([len(encoded)]) + encoded + TILED_STICKER.pack(y, x))
+        out.seek(0)
+        out.write(TILED_HEADER.pack(TILED_MAGIC, TILED_VERSION, height, width, tile_size, len(stickers), offset, digest.digest()))
+    return tiles_y * tiles_x
+
+class TiledStorage():
+    """
+    Reads tiles out of a memory-mapped tiled map file, keeping at most cache_tiles decoded tiles in memory (least recently used ones are dropped).
+    Tiles changed in memory (e.g. by blocking tiles) are never dropped, so changes aren't lost.
+    """
+    def __init__(self, path, cache_tiles = 256):
+
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, self.height, self.width, self.size, count, index_offset, self.source_hash = TILED_HEADER.unpack_from(self.data, 0)
+        if magic != TILED_MAGIC or version != TILED_VERSION:
+            raise Exception(f"{path} is not a tiled map file")
+        self.tiles_x = (self.width + self.size - 1) // self.size
+        tiles = self.tiles_x * ((self.height + self.size - 1) // self.size)
+        self.index = [TILED_INDEX.unpack_from(self.data, index_offset + i * TILED_INDEX.size) for i in range(tiles)]
+
+        self.stickers = {}
+        offset = index_offset + tiles * TILED_INDEX.size
+        for _ in range(count):
+            length = self.data[offset]
+            name = self.data[offset + 1:offset + 1 + length].decode()
+            offset += 1 + length
+            self.stickers[name] = TILED_STICKER.unpack_from(self.data, offset)
+            offset += TILED_STICKER.size
+
+        self.cache_tiles = cache_tiles
+        self.cache = OrderedDict() # Tile number -> decoded tile (bytearray)
+        self.dirty = set()
+
+    def tile(self, number):
+        """Returns the decoded tile with the given number (tile row * tiles per row + tile column), decoding it if it isn't cached."""
+        tile = self.cache.get(number)
+        if tile is not None:
+            self.cache.move_to_end(number)
+            return tile
+
+        offset, length = self.index[number]
+        tile = bytearray(zlib.decompress(self.data[offset:offset + length]))
+        self.cache[number] = tile
+        if len(self.cache) > self.cache_tiles:
+            for old in self.cache:
+                if old not in self.dirty:
+                    del self.cache[old]
+                    break
+        return tile
+
+    def close(self):
+        """Unmaps and closes the file."""
+        self.cache.clear()
+        self.data.close()
+        self.file.close()
+
+class TiledLayer():
+    """
+    One layer (0 = grid, 1 = neighbor masks) of a TiledStorage, indexed like the NumPy arrays of Map:
+    either with a flat tile index (y * width + x) or with a (y, x) tuple.
+    """
+    def __init__(self, storage, layer):
+
+        self.storage = storage
+        self.width = storage.width
+        self.size = storage.size
+        self.base = layer * storage.size * storage.size # Offset of the layer inside a decoded tile
+
+    def _locate(self, key):
+        """Returns (tile number, offset inside the decoded tile) of a key."""
+        if key.__class__ is tuple:
+            y, x = key
+        else:
+            y, x = divmod(key, self.width)
+        size = self.size
+        return (y // size) * self.storage.tiles_x + x // size, self.base + (y % size) * size + x % size
+
+    def __getitem__(self, key):
+        number, offset = self._locate(key)
+        return self.storage.tile(number)[offset]
+
+    def __setitem__(self, key, value):
+        number, offset = self._locate(key)
+        self.storage.tile(number)[offset] = value
+        self.storage.dirty.add(number)
+
+    def __len__(self):
+        return self.storage.height * self.width
+
+class SparseTable(dict):
+    """Dictionary returning a default value for missing keys without storing them. Stands in for the flat search arrays of Map."""
+    def __init__(self, default):
+        super().__init__()
+        self.default = default
+
+    def __missing__(self, key):
+        return self.default
+
+class TiledMap(Map):
+    """
+    Map stored in a tiled map file made by write_tiled, for maps too large to keep in memory.
+    Works like Map (connections, is_valid_tile, find_path, find_fastest_path, blocking tiles...), but only the tiles
+    touched by a search are decoded and search tables only grow with the explored area, so memory use doesn't depend on map size.
+
+    :param tilefile: Tiled map file
+    :param start: Starting position of the robot with the formula (y, x)
+    :param cache_tiles: Maximum amount of decoded tiles kept in memory
+    Other keyword arguments are passed on to Map.
+    """
+    def __init__(self, tilefile, start, cache_tiles = 256, **options):
+
+        self.cache_tiles = cache_tiles
+        super().__init__(tilefile, start, **options)
+
+    def _load(self, mapfile, compiled):
+        """Opens the tiled storage instead of reading the whole map."""
+        self.storage = TiledStorage(mapfile, self.cache_tiles)
+        self.height = self.storage.height
+        self.width = self.storage.width
+        self.map_hash = self.storage.source_hash.hex()
+        self.stickers = dict(self.storage.stickers)
+        self.sticker_at = {coords: name for name, coords in self.stickers.items()}
+        self.grid = TiledLayer(self.storage, 0)
+        self.masks = TiledLayer(self.storage, 1)
+        self.flatgrid = self.grid
+        self.flatmasks = self.masks
+        self.offsets = (-self.width, self.width, -1, 1)
+
+    def _search_tables(self):
+        """Search tables that only store visited tiles."""
+        return SparseTable(-1), SparseTable(0)
+
+    def print(self):
+        """Prints current map assignment to terminal."""
+        for y in range(self.height):
+            row = (self.grid[y, x] for x in range(self.width))
+            chars = (self.sticker_at.get((y, x), str(cost) if cost > 1 else "#" if cost else " ") for x, cost in enumerate(row))
+            print("".join(char if len(char) == 1 else "@" for char in chars))
+
+    def compile(self, outfile = None):
+        raise Exception("Tiled maps can't be compiled, they are already stored on disk")
+
+    def distance_field(self, sticker):
+        raise Exception("Distance fields cover the whole map, use find_path or find_fastest_path on tiled maps")
+
+    def snapshot(self):
+        raise Exception("Tiled maps can't be snapshotted, their tiles are changed in place")
+
+    def reload(self):
+        raise Exception("Tiled maps can't be reloaded, convert the edited text map with write_tiled and open it again")
+
+    def close(self):
+        """Closes the tiled map file."""
+        self.storage.close()
+
+def main():
+    parser = argparse.ArgumentParser(description = "Convert a text map to a tiled map file")
+    parser.add_argument("mapfile")
+    parser.add_argument("output")
+    parser.add_argument("--tile-size", type = int, default = 64)
+    args = parser.parse_args()
+    tiles = write_tiled(args.mapfile, args.output, args.tile_size)
+    print(f"Wrote {tiles} tiles of {args.tile_size}x{args.tile_size} to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+from mapping import HEADINGS
+
+class TourPlanner():
+    """
+    Orders a set of stickers to visit so the whole delivery tour from the robot's current position takes the least time.
+    Travel times between stickers depend on the heading the robot arrives with, so they are kept per (sticker, heading) pair
+    and tours are always evaluated with the real headings. Small sets are solved exactly with dynamic programming (Held-Karp),
+    larger ones start from a nearest-neighbor tour that is improved with 2-opt and Or-opt moves.
+
+    :param map: Map object to plan on, travel costs are taken from it
+    :param exact_limit: Largest amount of stickers that is solved exactly
+    """
+    def __init__(self, map, exact_limit = 10):
+
+        self.map = map
+        self.exact_limit = exact_limit
+
+    def legs(self, stickers, heading):
+        """
+        Builds the table of travel times used for planning. Node 0 is the robot's current position, node i is stickers[i - 1].
+        Returns a dictionary keyed by (node, heading index) holding dictionaries of target node -> (time, arrival heading index).
+        """
+        map = self.map
+        starts = [map.current]
+        for sticker in stickers:
+            coords = map.get_coords_of_sticker(sticker)
+            if coords is None:
+                raise Exception(f"'{sticker}' is not a valid sticker")
+            starts.append(coords)
+
+        legs = {}
+        for node, coords in enumerate(starts):
+            for direction in ([heading] if node == 0 else HEADINGS):
+                facing = HEADINGS[direction]
+                routes = map.find_fastest_paths(stickers, direction, coords)
+                leg = legs[(node, facing)] = {}
+                for target, sticker in enumerate(stickers, 1):
+                    if routes[sticker] is not None:
+                        # The robot arrives facing the direction of the last move, stickers on the same tile are reached right away
+                        path, time = routes[sticker]
+                        leg[target] = (time, HEADINGS[path[-1][1]] if path else facing)
+        return legs
+
+    def tour_time(self, order, heading, legs):
+        """Returns the time in seconds it takes to visit nodes in the given order starting from node 0, infinite if a leg can't be driven."""
+        node = 0
+        facing = HEADINGS[heading]
+        total = 0.0
+        for target in order:
+            leg = legs[(node, facing)].get(target)
+            if leg is None:
+                return float("inf")
+            time, facing = leg
+            total += time
+            node = target
+        return total
+
+    def plan(self, stickers, heading):
+        """
+        Orders the given stickers for the fastest tour starting from the current coordinates of the map facing heading.
+        Returns a tuple (ordered list of stickers, predicted total time in seconds), or None if some sticker can't be reached.
+        """
+        stickers = list(dict.fromkeys(stickers)) # Drop duplicates, keep order
+        if not stickers:
+            return [], 0.0
+        legs = self.legs(stickers, heading)
+        if len(stickers) <= self.exact_limit:
+            order = self._exact(len(stickers), heading, legs)
+        else:
+            order = self._heuristic(len(stickers), heading, legs)
+
+        time = self.tour_time(order, heading, legs) if order is not None else float("inf")
+        if time == float("inf"):
+            return None
+        return [stickers[node - 1] for node in order], time
+
+    def _exact(self, count, heading, legs):
+        """Held-Karp dynamic programming over (visited set, last node, heading). Returns the best order of nodes 1 to count, or None."""
+        full = (1 << count) - 1
+
+        # best[(visited, last, heading)] = (time, previous key)
+        best = {}
+        for target, (time, facing) in legs[(0, HEADINGS[heading])].items():
+            if target != 0:
+                best[(1 << (target - 1), target, facing)] = (time, None)
+
+        for visited in range(1, full + 1):
+            for last in range(1, count + 1):
+                if not visited & (1 << (last - 1)):
+                    continue
+                for facing in range(4):
+                    key = (visited, last, facing)
+                    if key not in best:
+                        continue
+                    time = best[key][0]
+                    for target, (leg, arrival) in legs[(last, facing)].items():
+                        if target == 0:
+                            continue
+                        bit = 1 << (target - 1)
+                        if visited & bit:
+                            continue
+                        child = (visited | bit, target, arrival)
+                        if time + leg < best.get(child, (float("inf"), None))[0]:
+                            best[child] = (time + leg, key)
+
+        ends = [key for key in best if key[0] == full]
+        if not ends:
+            return None
+        key = min(ends, key = lambda key: best[key][0])
+        order = []
+        while key is not None:
+            order.append(key[1])
+            key = best[key][1]
+        order.reverse()
+        return order
+
+    def _heuristic(self, count, heading, legs):
+        """Nearest-neighbor tour improved with 2-opt and Or-opt moves until no move makes it faster. Returns an order of nodes 1 to count."""
+
+        # Greedy start: always drive to the closest sticker not visited yet
+        order = []
+        remaining = set(range(1, count + 1))
+        node = 0
+        facing = HEADINGS[heading]
+        while remaining:
+            options = [(legs[(node, facing)].get(target, (float("inf"), facing)), target) for target in remaining]
+            (_, facing), node = min(options)
+            order.append(node)
+            remaining.discard(node)
+
+        best = self.tour_time(order, heading, legs)
+        improved = True
+        while improved:
+            improved = False
+
+            # 2-opt: reverse a part of the tour
+            for i in range(count - 1):
+                for k in range(i + 1, count):
+                    candidate = order[:i] + order[i:k + 1][::-1] + order[k + 1:]
+                    time = self.tour_time(candidate, heading, legs)
+                    if time < best:
+                        order, best, improved = candidate, time, True
+
+            # Or-opt: move a run of one to three stickers somewhere else in the tour
+            for length in (1, 2, 3):
+                for i in range(count - length + 1):
+                    segment = order[i:i + length]
+                    rest = order[:i] + order[i + length:]
+                    for j in range(len(rest) + 1):
+                        if j == i:
+                            continue
+                        candidate = rest[:j] + segment + rest[j:]
+                        time = self.tour_time(candidate, heading, legs)
+                        if time < best:
+                            order, best, improved = candidate, time, True
+                            break
+
+        return order
@@ -0,0 +1,111 @@
+# Waypoint registry: named junctions of the map with their coordinates and the UID of the RFID sticker placed on them
+# Waypoints are kept in a side file next to the map (map1.waypoints for map1.txt), one waypoint per line:
+#
+#   <name> <y> <x> [<uid>]
+#
+# with the UID written as hex bytes separated by colons (e.g. 88:04:F1:3F) or "-" when the sticker isn't known yet.
+# Empty lines and lines starting with "#" are ignored. Names can't contain whitespace.
+
+import os
+
+def waypoints_path(mapfile):
+    """Returns the path of the waypoint file belonging to a text map file, e.g. map1.waypoints for map1.txt."""
+    return os.path.splitext(mapfile)[0] + ".waypoints"
+
+def uid_string(uid):
+    """Formats the UID bytes read from an RFID sticker (the check byte after the 4 UID bytes is dropped) like in waypoint files."""
+    return ":".join(f"{byte:02X}" for byte in uid[:4])
+
+class Waypoint():
+    """One named waypoint: its name, coordinates (y, x) and sticker UID (None if unknown)."""
+    __slots__ = ("name", "coords", "uid")
+
+    def __init__(self, name, coords, uid = None):
+        self.name = name
+        self.coords = coords
+        self.uid = uid
+
+class WaypointRegistry():
+    """
+    Set of named waypoints with dictionary lookups by name, by sticker UID and by coordinates.
+
+    :param path: Waypoint file to read, or None to start empty
+    """
+    def __init__(self, path = None):
+
+        self.by_name = {} # Name -> Waypoint
+        self.by_uid = {} # UID string -> Waypoint
+        self.by_coords = {} # Coordinates (y, x) -> Waypoint
+        if path is not None:
+            self.load(path)
+
+    def __len__(self):
+        return len(self.by_name)
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def __iter__(self):
+        return iter(self.by_name.values())
+
+    def add(self, name, coords, uid = None):
+        """Registers a waypoint. Names, UIDs and coordinates all have to be unique."""
+        coords = tuple(coords)
+        if not name or name.split() != [name]:
+            raise Exception(f"'{name}' is not a valid waypoint name")
+        if name in self.by_name:
+            raise Exception(f"Waypoint '{name}' is registered more than once")
+        if coords in self.by_coords:
+            raise Exception(f"Waypoints '{self.by_coords[coords].name}' and '{name}' are both at {coords}")
+        if uid is not None:
+            uid = uid.upper()
+            if uid in self.by_uid:
+                raise Exception(f"Waypoints '{self.by_uid[uid].name}' and '{name}' have the same UID {uid}")
+
+        waypoint = Waypoint(name, coords, uid)
+        self.by_name[name] = waypoint
+        self.by_coords[coords] = waypoint
+        if uid is not None:
+            self.by_uid[uid] = waypoint
+        return waypoint
+
+    def get(self, name):
+        """Returns the waypoint with the given name, None if there is none."""
+        return self.by_name.get(name)
+
+    def name_of_uid(self, uid):
+        """Returns the name of the waypoint whose sticker has the given UID (string or UID bytes), None if it isn't registered."""
+        if not isinstance(uid, str):
+            uid = uid_string(uid)
+        waypoint = self.by_uid.get(uid.upper())
+        return waypoint.name if waypoint is not None else None
+
+    def at(self, coords):
+        """Returns the waypoint at the given coordinates (y, x), None if there is none."""
+        return self.by_coords.get(tuple(coords))
+
+    def load(self, path):
+        """Adds every waypoint of a waypoint file."""
+        with open(path) as file:
+            for number, line in enumerate(file, 1):
+                fields = line.split()
+                if not fields or fields[0].startswith("#"):
+                    continue
+                if len(fields) not in (3, 4):
+                    raise Exception(f"{path}, line {number}: expected '<name> <y> <x> [<uid>]'")
+                try:
+                    coords = (int(fields[1]), int(fields[2]))
+                except ValueError:
+                    raise Exception(f"{path}, line {number}: coordinates have to be whole numbers")
+                uid = fields[3] if len(fields) == 4 and fields[3] != "-" else None
+                self.add(fields[0], coords, uid)
+
+    def save(self, path):
+        """Writes every waypoint to a waypoint file, replacing it atomically."""
+        temp = path + ".tmp"
+        with open(temp, "w") as file:
+            file.write("# name y x uid\n")
+            for waypoint in self.by_name.values():
+                y, x = waypoint.coords
+                file.write(f"{waypoint.name} {y} {x} {waypoint.uid or '-'}\n")
+        os.replace(temp, path)